@@ -1,18 +1,36 @@
-import spacy
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import classification_report
+import joblib
 import json
+import logging
+import os
+
+from services.model_registry import get_nlp
+
+logger = logging.getLogger(__name__)
+
+NLP_AGENT_MODEL_PATH = os.getenv("NLP_AGENT_MODEL_PATH", "nlp_agent.joblib")
+NLP_AGENT_BATCH_SIZE = int(os.getenv("NLP_AGENT_BATCH_SIZE", "64"))
+# Lemmas and stop words only need the tagger/lemmatizer; skip the costly components
+NLP_AGENT_DISABLED_PIPES = ["ner", "parser"]
 
 class NLPAgent:
-    def __init__(self):
-        # Load spaCy model and NLTK resources
-        self.nlp = spacy.load("en_core_web_trf")
+    def __init__(self, model_path=NLP_AGENT_MODEL_PATH):
+        # NLTK resources; the spaCy model comes from the shared registry
         self.stop_words = set(stopwords.words("english"))
+        self.model_path = model_path
         self.vectorizer = CountVectorizer()
         self.classifier = MultinomialNB()
+        # A model trained by another process or an earlier run is served as is
+        if model_path and os.path.exists(model_path):
+            self.load_model(model_path)
+
+    @property
+    def nlp(self):
+        return get_nlp()
 
     def preprocess_text(self, text, use_spacy=True):
         """
@@ -21,22 +39,56 @@ class NLPAgent:
         :param use_spacy: Use spaCy if True, else use NLTK
         :return: Cleaned text
         """
+        return self.preprocess_texts([text], use_spacy)[0]
+
+    def preprocess_texts(self, texts, use_spacy=True):
+        """
+        Preprocess many texts, with spaCy in `nlp.pipe` batches
+        :param texts: Input texts
+        :param use_spacy: Use spaCy if True, else use NLTK
+        :return: Cleaned texts, in order
+        """
         if use_spacy:
-            doc = self.nlp(text)
-            tokens = [token.lemma_.lower() for token in doc if not token.is_stop and token.is_alpha]
-        else:
-            tokens = word_tokenize(text)
-            tokens = [word.lower() for word in tokens if word.isalpha() and word not in self.stop_words]
-        return " ".join(tokens)
+            docs = self.nlp.pipe(texts, batch_size=NLP_AGENT_BATCH_SIZE, disable=NLP_AGENT_DISABLED_PIPES)
+            return [" ".join(token.lemma_.lower() for token in doc if not token.is_stop and token.is_alpha)
+                    for doc in docs]
+        return [" ".join(word.lower() for word in word_tokenize(text)
+                         if word.isalpha() and word not in self.stop_words)
+                for text in texts]
 
-    def train_model(self, data, labels):
+    def train_model(self, data, labels, save=True):
         """
         Train a Naive Bayes model on the provided data
         :param data: List of input texts
         :param labels: Corresponding labels
+        :param save: Persist the trained model to `model_path`
         """
         X = self.vectorizer.fit_transform(data)
         self.classifier.fit(X, labels)
+        if save and self.model_path:
+            self.save_model(self.model_path)
+
+    def save_model(self, path):
+        """
+        Write the vectorizer and classifier to `path`, uncompressed so they can be memory-mapped
+        :param path: Model file
+        """
+        temp_path = f"{path}.tmp"
+        joblib.dump({"vectorizer": self.vectorizer, "classifier": self.classifier}, temp_path)
+        # Readers never see a partially written file
+        os.replace(temp_path, path)
+        logger.info(f"Saved NLP agent model to {path}")
+
+    def load_model(self, path, mmap_mode="r"):
+        """
+        Load a model written by `save_model`; its arrays are memory-mapped and shared between processes
+        :param path: Model file
+        :param mmap_mode: numpy memmap mode, None to read everything into memory
+        """
+        model = joblib.load(path, mmap_mode=mmap_mode)
+        self.vectorizer = model["vectorizer"]
+        self.classifier = model["classifier"]
+        logger.info(f"Loaded NLP agent model from {path}")
 
     def classify_text(self, text):
         """
@@ -44,9 +96,19 @@ class NLPAgent:
         :param text: Input text
         :return: Predicted class
         """
-        processed_text = self.preprocess_text(text)
-        X = self.vectorizer.transform([processed_text])
-        return self.classifier.predict(X)[0]
+        return self.classify_texts([text])[0]
+
+    def classify_texts(self, texts):
+        """
+        Classify many texts with one sparse transform and one predict
+        :param texts: Input texts
+        :return: Predicted classes, in order
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        X = self.vectorizer.transform(self.preprocess_texts(texts))
+        return self.classifier.predict(X).tolist()
 
     def generate_report(self, texts, labels):
         """
@@ -55,5 +117,5 @@ class NLPAgent:
         :param labels: True labels
         :return: Classification report
         """
-        predictions = [self.classify_text(text) for text in texts]
+        predictions = self.classify_texts(texts)
         return classification_report(labels, predictions, output_dict=True)
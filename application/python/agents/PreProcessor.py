@@ -1,6 +1,7 @@
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from spacy import displacy
-import spacy
+
+from classes.SentimentAnalysis import POLARITY_FIELDS, polarity_matrix, polarity_scores
+from services.model_registry import get_nlp
 
 # Constants
 EXCLUDED_ENTITY_TYPES = {"TIME", "DATE", "LANGUAGE", "PERCENT", "MONEY", "QUANTITY", "ORDINAL", "CARDINAL"}
@@ -8,12 +9,16 @@ EXCLUDED_ENTITY_TYPES = {"TIME", "DATE", "LANGUAGE", "PERCENT", "MONEY", "QUANTI
 
 # Base NLP Processor Class
 class PreProcessor:
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_trf")
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+    @property
+    def nlp(self):
+        return get_nlp()
 
     def analyze_sentiment(self, text: str):
-        return self.sentiment_analyzer.polarity_scores(text)
+        return polarity_scores(text)
+
+    def analyze_sentiments(self, texts):
+        """Polarity scores of many texts, from a single pass over them."""
+        return [dict(zip(POLARITY_FIELDS, row)) for row in polarity_matrix(texts).tolist()]
 
     def extract_entities(self, text: str):
         doc = self.nlp(text)
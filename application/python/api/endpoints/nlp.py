@@ -1,21 +1,35 @@
-from fastapi import APIRouter, HTTPException, File, UploadFile
+from fastapi import APIRouter, HTTPException, File, UploadFile, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import spacy
+from typing import List, Optional
+from urllib.parse import urlsplit
+import asyncio
+import base64
 import os
-import pymupdf4llm
 from newspaper import Article, Config
 from markdownify import markdownify as md
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import yake
 import socials
 import socid_extractor
 import socialshares
 from spacy import displacy
-import sqlite3
 import json
+import sqlite3
 from datetime import datetime
 import logging
 
+from classes.SentimentAnalysis import polarity_scores
+from classes.TextSummarizer import TextProcessor
+from services.article_cache import ArticleCache, content_hash
+from services.model_registry import ModelRegistry, get_nlp
+from services.chunked_ner import chunk_text, extract_entities, unique_entities
+from services.entity_store import DOC_TYPES, EntityStore, save_entities
+from services.jobs import job_queue
+from services.pdf_service import PdfService
+from services.summary_service import SUMMARY_BATCH_LIMIT, SummaryService
+from services.keywords import extract_keywords, extract_tag_keywords, text_hash
+from services.storage import SQLITE_MAX_PARAMS, nlp_db
+from services.worker_pool import nlp_pool, io_pool, process_pool
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,63 +37,83 @@ logger = logging.getLogger(__name__)
 # Initialize FastAPI Router
 router = APIRouter()
 
-# Load SpaCy Model
-nlp = spacy.load("en_core_web_trf")
-
-# Directories and Database
+# Directories
 UPLOAD_DIRECTORY = "pdfs"
-DATABASE = "nlp_data.db"
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
-# Initialize Sentiment Analyzer
-sentiment_analyzer = SentimentIntensityAnalyzer()
-
 # Constants
 EXCLUDED_ENTITY_TYPES = {}
+SOCIAL_PLATFORMS = ["facebook", "pinterest", "linkedin", "google", "reddit"]
+# Article outputs: base fields come with the download, derived ones are computed on request
+BASE_FIELDS = ["title", "date", "text", "html", "summary", "authors", "banner", "images", "videos"]
+DERIVED_FIELDS = ["markdown", "keywords", "entities", "spacy", "spacy_markdown", "social", "sentiment",
+                  "accounts", "social_shares"]
+DOC_FIELDS = {"entities", "spacy", "spacy_markdown"}
+SOCIAL_FIELDS = {"social", "social_shares", "sentiment", "accounts"}
+# Outputs derived from the URL rather than the text; never reused from another link's record
+LINK_FIELDS = {"social", "social_shares"}
+PDF_FIELDS = ["markdown", "entities"]
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 500
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "200"))
+# Search sources: table, columns returned per hit, BM25 column weights
+SEARCH_SOURCES = {
+    "articles": ("articles", ["id", "link", "title", "created_at"], "10.0, 1.0"),
+    "pdfs": ("pdfs", ["id", "filename", "created_at"], "1.0"),
+}
+# Listing projections: heavy blob columns (full text, HTML, markdown) are only read when asked for
+LISTINGS = {
+    "articles": {
+        "columns": ["id", "link", "title", "date", "created_at", "content_hash", "summary", "text", "data"],
+        "default": ["id", "link", "title", "date", "created_at"],
+        "json": {"data"},
+    },
+    "tags": {
+        "columns": ["id", "text", "text_hash", "keywords", "created_at"],
+        "default": ["id", "keywords", "created_at"],
+        "json": {"keywords"},
+    },
+    "pdfs": {
+        "columns": ["id", "filename", "created_at", "computed_fields", "content_hash", "markdown", "entities"],
+        "default": ["id", "filename", "created_at", "computed_fields"],
+        "json": {"entities", "computed_fields"},
+    },
+}
+ARTICLE_FETCH_CONCURRENCY = int(os.getenv("ARTICLE_FETCH_CONCURRENCY", "16"))
+ARTICLE_FETCH_PER_DOMAIN = int(os.getenv("ARTICLE_FETCH_PER_DOMAIN", "2"))
+ARTICLE_BATCH_SIZE = int(os.getenv("ARTICLE_BATCH_SIZE", "8"))
+ARTICLE_BATCH_MAX = int(os.getenv("ARTICLE_BATCH_MAX", "500"))
+TAG_BATCH_MAX = int(os.getenv("TAG_BATCH_MAX", "1000"))
 
 # Request Models
 class ArticleAction(BaseModel):
     link: str
+    force_refresh: bool = False
+    fields: Optional[List[str]] = None
+    background: bool = False
+
+class ArticleBatchAction(BaseModel):
+    links: List[str]
+    batch_size: int = ARTICLE_BATCH_SIZE
+    force_refresh: bool = False
+    fields: Optional[List[str]] = None
 
 class SummarizeAction(BaseModel):
     text: str
 
-# Database Setup
-def init_db():
-    conn = sqlite3.connect(DATABASE)
-    c = conn.cursor()
-    
-    # Create tables
-    c.execute('''CREATE TABLE IF NOT EXISTS articles (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        link TEXT UNIQUE,
-        title TEXT,
-        date TEXT,
-        text TEXT,
-        data JSON,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS pdfs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        filename TEXT UNIQUE,
-        markdown TEXT,
-        entities JSON,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS tags (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        text TEXT,
-        keywords JSON,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-    
-    conn.commit()
-    conn.close()
-
-# Initialize database on startup
-init_db()
+class TagBatchAction(BaseModel):
+    texts: List[str]
+
+class ArticleSummaryAction(BaseModel):
+    since: Optional[str] = None
+    until: Optional[str] = None
+    limit: int = SUMMARY_BATCH_LIMIT
+    only_missing: bool = True
+    background: bool = False
+
+# Result cache over the articles table
+article_cache = ArticleCache(nlp_db)
+entity_store = EntityStore(nlp_db)
 
 # Helper Functions
 def filter_entities(doc):
@@ -101,166 +135,656 @@ def fetch_article(link: str) -> Article:
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch article: {str(e)}")
 
-def extract_keywords(text: str, language: str = "en", n: int = 1, dedup_lim: float = 0.9, top: int = 5):
-    extractor = yake.KeywordExtractor(lan=language, n=n, dedupLim=dedup_lim, top=top)
-    return sorted(extractor.extract_keywords(text), key=lambda x: x[1])
+def summarize_text(text: str):
+    """Parse (in bounded chunks, NER disabled) and summarize; runs in the NLP pool."""
+    sentences = []
+    for doc in get_nlp().pipe((chunk for _, chunk in chunk_text(text)), disable=["ner"]):
+        sentences.extend(doc.sents)
+    return {"summary": TextProcessor(sentences).summarize_article(), "sentences": len(sentences)}
 
-def perform_social_analysis(link: str, text: str):
-    try:
-        return {
-            "social_accounts": socials.extract(link).get_matches_per_platform(),
-            "social_shares": socialshares.fetch(link, platforms=["facebook", "pinterest", "linkedin", "google", "reddit"]),
-            "sentiment": sentiment_analyzer.polarity_scores(text),
-            "accounts": socid_extractor.extract(text),
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Social analysis failed: {str(e)}")
+def article_record(fetched_article: Article):
+    """Fields that come straight from the download; every stored record has them."""
+    return {
+        "title": fetched_article.title,
+        "date": str(fetched_article.publish_date) if fetched_article.publish_date else None,
+        "text": fetched_article.text,
+        "html": fetched_article.article_html,
+        "summary": fetched_article.summary,
+        "authors": fetched_article.authors,
+        "banner": fetched_article.top_image,
+        "images": list(fetched_article.images),
+        "videos": fetched_article.movies,
+        "computed_fields": [],
+    }
+
+def to_markdown(html: str):
+    return md(html or "", newline_style="BACKSLASH", strip=["a"], heading_style="ATX")
+
+class ArticleFields:
+    """
+    Computes the derived outputs of one article record on demand.
+    The spaCy `Doc` is only parsed when an output that needs it is requested.
+    """
+
+    def __init__(self, link: str, data: dict, doc=None):
+        self.link = link
+        self.data = dict(data)
+        if "computed_fields" in data:
+            self.data["computed_fields"] = list(data["computed_fields"])
+        self._doc = doc
+
+    @property
+    def doc(self):
+        if self._doc is None:
+            self._doc = get_nlp()(self.data["text"])
+        return self._doc
+
+    def markdown(self):
+        return to_markdown(self.data["html"])
+
+    def keywords(self):
+        return extract_keywords(self.data["text"], top=5)
+
+    def entities(self):
+        return filter_entities(self.doc)
+
+    def spacy(self):
+        return displacy.render(self.doc, style="ent", options={"ents": [e[0] for e in self.get("entities")]})
+
+    def spacy_markdown(self):
+        return to_markdown(self.get("spacy"))
+
+    def social(self):
+        return socials.extract(self.link).get_matches_per_platform()
+
+    def social_shares(self):
+        return socialshares.fetch(self.link, platforms=SOCIAL_PLATFORMS)
+
+    def sentiment(self):
+        return polarity_scores(self.data["text"])
+
+    def accounts(self):
+        return socid_extractor.extract(self.data["text"])
+
+    def get(self, field: str):
+        computed = self.data.setdefault("computed_fields", [])
+        if field not in computed:
+            try:
+                self.data[field] = getattr(self, field)()
+            except Exception as e:
+                if field in SOCIAL_FIELDS:
+                    raise HTTPException(status_code=500, detail=f"Social analysis failed: {str(e)}")
+                raise
+            computed.append(field)
+        return self.data[field]
+
+    def resolve(self, fields):
+        for field in fields:
+            self.get(field)
+        return self.data
+
+def missing_fields(data: dict, fields):
+    """Derived fields in `fields` that the stored record does not have yet."""
+    # Records stored before field selection existed have every output
+    if "computed_fields" not in data:
+        return []
+    return [field for field in fields if field in DERIVED_FIELDS and field not in data["computed_fields"]]
+
+def without_link_fields(data: dict):
+    """Copy of a record stored under another URL, minus the outputs that depend on that URL."""
+    computed = data.get("computed_fields", DERIVED_FIELDS)
+    data = {field: value for field, value in data.items() if field not in LINK_FIELDS}
+    data["computed_fields"] = [field for field in computed if field not in LINK_FIELDS]
+    return data
+
+def requested_fields(fields):
+    if not fields:
+        return list(DERIVED_FIELDS)
+    unknown = set(fields) - set(BASE_FIELDS) - set(DERIVED_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [field for field in DERIVED_FIELDS if field in fields]
+
+def select_fields(data: dict, fields):
+    """Response payload: everything when no selection was made, otherwise only the requested fields."""
+    if not fields:
+        return data
+    return {field: data.get(field) for field in fields}
+
+def complete_article(link: str, data: dict, fields, doc=None):
+    """Fill in the requested outputs missing from `data`; CPU-bound, meant for the worker pool."""
+    return ArticleFields(link, data, doc).resolve(fields)
+
+def analyze_fetched_article(link: str, fetched_article: Article, fields):
+    """Analyze a downloaded article, computing only `fields`; CPU-bound, meant for the worker pool."""
+    return complete_article(link, article_record(fetched_article), fields)
+
+def analyze_article_batch(fetched: List[tuple], fields):
+    """Analyze already downloaded `(link, article)` pairs with a single `nlp.pipe` pass."""
+    records = [(link, article_record(article)) for link, article in fetched]
+    if any(field in DOC_FIELDS for field in fields):
+        docs = get_nlp().pipe((data["text"] for _, data in records), batch_size=len(records))
+    else:
+        docs = (None for _ in records)
+    results = []
+    for (link, data), doc in zip(records, docs):
+        try:
+            results.append((link, complete_article(link, data, fields, doc), None))
+        except HTTPException as e:
+            results.append((link, None, e.detail))
+        except Exception as e:
+            results.append((link, None, str(e)))
+    return results
+
+async def save_articles(rows: List[tuple]):
+    """Persist `(link, data)` pairs and their entity mentions in a single transaction."""
+    async with nlp_db.transaction() as conn:
+        for link, data in rows:
+            cursor = await conn.execute('''INSERT OR REPLACE INTO articles (link, title, date, text, data, content_hash)
+                                           VALUES (?, ?, ?, ?, ?, ?)''',
+                                        (link, data["title"], data["date"], data["text"], json.dumps(data),
+                                         content_hash(data["text"])))
+            await save_entities(conn, "article", cursor.lastrowid, data.get("entities"))
+
+def pdf_entities(markdown_text: str):
+    """Entities of a converted PDF, extracted chunk by chunk; CPU-bound, meant for the worker pool."""
+    return unique_entities(extract_entities(markdown_text, excluded=EXCLUDED_ENTITY_TYPES))
+
+async def no_report(progress: float, message: Optional[str] = None):
+    pass
+
+async def run_article(article: ArticleAction, report=no_report):
+    """Cache lookup, download, analysis and storage of one article; shared by the endpoint and its job."""
+    fields = requested_fields(article.fields)
+    if article.force_refresh:
+        article_cache.invalidate(article.link)
+    else:
+        cached = await article_cache.get(article.link)
+        if cached is not None:
+            missing = missing_fields(cached, fields)
+            if not missing:
+                return {"data": select_fields(cached, article.fields), "cached": True}
+            # Only compute what the stored record lacks
+            await report(0.3, "analyzing")
+            response_data = await nlp_pool.run(complete_article, article.link, cached, missing)
+            await save_articles([(article.link, response_data)])
+            article_cache.put(article.link, response_data)
+            return {"data": select_fields(response_data, article.fields), "cached": True}
+
+    await report(0.1, "fetching")
+    fetched_article = await io_pool.run(fetch_article, article.link)
+    hit = None
+    if not article.force_refresh:
+        hit = await article_cache.get_by_content(content_hash(fetched_article.text))
+    await report(0.3, "analyzing")
+    if hit is None:
+        article_cache.miss()
+        response_data = await nlp_pool.run(analyze_fetched_article, article.link, fetched_article, fields)
+    else:
+        source, response_data = hit
+        if source != article.link:
+            response_data = without_link_fields(response_data)
+        response_data = await nlp_pool.run(complete_article, article.link, response_data,
+                                           missing_fields(response_data, fields))
+
+    # Save to SQLite
+    await report(0.9, "saving")
+    await save_articles([(article.link, response_data)])
+    article_cache.put(article.link, response_data)
+
+    return {"data": select_fields(response_data, article.fields), "cached": False}
+
+@job_queue.handler("article")
+async def article_job(payload: dict, report):
+    return await run_article(ArticleAction(**payload), report)
 
 # Endpoints
 @router.post("/nlp/article")
 async def process_article(article: ArticleAction):
     try:
-        fetched_article = fetch_article(article.link)
-        doc = nlp(fetched_article.text)
-        filtered_entities = filter_entities(doc)
-        social_analysis = perform_social_analysis(article.link, fetched_article.text)
-        spacy_html = displacy.render(doc, style="ent", options={"ents": [e[0] for e in filtered_entities]})
-        keywords = extract_keywords(fetched_article.text, top=5)
-        
-        response_data = {
-            "title": fetched_article.title,
-            "date": str(fetched_article.publish_date) if fetched_article.publish_date else None,
-            "text": fetched_article.text,
-            "markdown": md(fetched_article.article_html, newline_style="BACKSLASH", strip=["a"], heading_style="ATX"),
-            "html": fetched_article.article_html,
-            "summary": fetched_article.summary,
-            "keywords": keywords,
-            "authors": fetched_article.authors,
-            "banner": fetched_article.top_image,
-            "images": list(fetched_article.images),
-            "entities": filtered_entities,
-            "videos": fetched_article.movies,
-            "social": social_analysis["social_accounts"],
-            "spacy": spacy_html,
-            "spacy_markdown": md(spacy_html, newline_style="BACKSLASH", strip=["a"], heading_style="ATX"),
-            "sentiment": social_analysis["sentiment"],
-            "accounts": social_analysis["accounts"],
-            "social_shares": social_analysis["social_shares"],
-        }
-
-        # Save to SQLite
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
-        c.execute('''INSERT OR REPLACE INTO articles (link, title, date, text, data) 
-                    VALUES (?, ?, ?, ?, ?)''', 
-                 (article.link, 
-                  response_data["title"], 
-                  response_data["date"], 
-                  response_data["text"], 
-                  json.dumps(response_data)))
-        conn.commit()
-        conn.close()
-
-        return {"data": response_data}
+        if article.background:
+            return {"job_id": await job_queue.submit("article", article.model_dump(exclude={"background"}))}
+        return await run_article(article)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing article: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing article: {str(e)}")
 
+@router.post("/nlp/articles/batch")
+async def process_article_batch(action: ArticleBatchAction):
+    """
+    Fetch many articles concurrently (bounded globally and per domain), analyze them in `nlp.pipe`
+    batches and stream one NDJSON line per link as soon as its batch is done.
+    """
+    links = list(dict.fromkeys(action.links))
+    if len(links) > ARTICLE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ARTICLE_BATCH_MAX} links per request")
+    fields = requested_fields(action.fields)
+    batch_size = max(1, min(action.batch_size, len(links)))
+    fetch_limit = asyncio.Semaphore(ARTICLE_FETCH_CONCURRENCY)
+    domain_limits = {}
+    # Fetchers wait for the analysis once two batches are downloaded, so a slow client bounds memory use
+    fetched = asyncio.Queue(maxsize=batch_size * 2)
+
+    async def fetch_one(link: str):
+        domain = urlsplit(link).netloc.lower()
+        domain_limit = domain_limits.setdefault(domain, asyncio.Semaphore(ARTICLE_FETCH_PER_DOMAIN))
+        # Per-domain slot first: tasks queued on a busy domain must not hold global slots other domains need
+        async with domain_limit, fetch_limit:
+            try:
+                if not action.force_refresh:
+                    cached = await article_cache.get(link)
+                    if cached is not None and not missing_fields(cached, fields):
+                        await fetched.put((link, None, None, cached))
+                        return
+                await fetched.put((link, await io_pool.run(fetch_article, link), None, None))
+            except HTTPException as e:
+                await fetched.put((link, None, e.detail, None))
+            except Exception as e:
+                await fetched.put((link, None, str(e), None))
+
+    async def process(pending: List[tuple]):
+        try:
+            results = await nlp_pool.run(analyze_article_batch, pending, fields)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            return [(link, None, detail) for link, _ in pending]
+        rows = [(link, data) for link, data, error in results if error is None]
+        if rows:
+            await save_articles(rows)
+            for link, data in rows:
+                article_cache.put(link, data)
+        return results
+
+    async def stream():
+        tasks = [asyncio.create_task(fetch_one(link)) for link in links]
+        pending = []
+        try:
+            for _ in links:
+                link, fetched_article, error, cached = await fetched.get()
+                if error is not None:
+                    yield json.dumps({"link": link, "error": error}) + "\n"
+                    continue
+                if cached is not None:
+                    yield json.dumps({"link": link, "data": select_fields(cached, action.fields), "error": None,
+                                      "cached": True}) + "\n"
+                    continue
+                article_cache.miss()
+                pending.append((link, fetched_article))
+                if len(pending) >= batch_size:
+                    for link, data, error in await process(pending):
+                        yield json.dumps({"link": link, "data": data and select_fields(data, action.fields),
+                                          "error": error}) + "\n"
+                    pending = []
+            if pending:
+                for link, data, error in await process(pending):
+                    yield json.dumps({"link": link, "data": data and select_fields(data, action.fields),
+                                      "error": error}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.post("/nlp/summarize")
+async def summarize(action: SummarizeAction):
+    try:
+        return {"data": await nlp_pool.run(summarize_text, action.text)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Summarization failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+
+@job_queue.handler("summarize")
+async def summarize_job(payload: dict, report):
+    return await SummaryService.summarize_articles(nlp_db, **payload)
+
+@router.post("/nlp/articles/summarize")
+async def summarize_articles(action: ArticleSummaryAction):
+    """
+    Summarize the stored articles of a time window (the last 24 hours by default) as one corpus,
+    on the summarizer process pool, and save each summary in the `summary` column.
+    """
+    try:
+        if action.background:
+            return {"job_id": await job_queue.submit("summarize", action.model_dump(exclude={"background"}))}
+        return {"data": await SummaryService.summarize_articles(nlp_db, **action.model_dump(exclude={"background"}))}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Article summarization failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Article summarization failed: {str(e)}")
+
+async def tag_texts(texts: List[str]):
+    """
+    `(text_hash, keywords, cached)` of each text, in order. Texts already in `tags` are answered from
+    their row; the others are split across the process pool, so YAKE runs outside the GIL, and each
+    distinct text is stored once.
+    """
+    hashes = [text_hash(text) for text in texts]
+    distinct = dict(zip(hashes, texts))
+    keys = list(distinct)
+    stored = {}
+    for start in range(0, len(keys), SQLITE_MAX_PARAMS):
+        chunk = keys[start:start + SQLITE_MAX_PARAMS]
+        rows = await nlp_db.fetchall(
+            f"SELECT text_hash, keywords FROM tags WHERE text_hash IN ({', '.join('?' * len(chunk))})", chunk)
+        stored.update((row["text_hash"], json.loads(row["keywords"])) for row in rows)
+
+    missing = [key for key in keys if key not in stored]
+    size = max(1, -(-len(missing) // process_pool.size))
+    chunks = [missing[start:start + size] for start in range(0, len(missing), size)]
+    results = await asyncio.gather(*[process_pool.run(extract_tag_keywords, [distinct[key] for key in chunk])
+                                     for chunk in chunks])
+    extracted = {key: keywords for chunk, result in zip(chunks, results) for key, keywords in zip(chunk, result)}
+    if extracted:
+        # A concurrent request may have stored the same text meanwhile; its row stands
+        await nlp_db.executemany(
+            "INSERT INTO tags (text, text_hash, keywords) VALUES (?, ?, ?) ON CONFLICT (text_hash) DO NOTHING",
+            [(distinct[key], key, json.dumps(keywords)) for key, keywords in extracted.items()])
+    return [(key, stored[key], True) if key in stored else (key, extracted[key], False) for key in hashes]
+
 @router.post("/nlp/tags")
 async def extract_tags(action: SummarizeAction):
     try:
-        keywords = extract_keywords(action.text, n=3, top=5)
-        
-        # Save to SQLite
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
-        c.execute('''INSERT INTO tags (text, keywords) VALUES (?, ?)''', 
-                 (action.text, json.dumps(keywords)))
-        conn.commit()
-        conn.close()
-
-        return {"data": keywords}
+        [(_, keywords, cached)] = await tag_texts([action.text])
+        return {"data": keywords, "cached": cached}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Keyword extraction failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Keyword extraction failed: {str(e)}")
 
+@router.post("/nlp/tags/batch")
+async def extract_tags_batch(action: TagBatchAction):
+    """Keywords of many texts in one request; identical texts are extracted and stored only once."""
+    if len(action.texts) > TAG_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {TAG_BATCH_MAX} texts per request")
+    try:
+        return {"data": [{"text_hash": key, "keywords": keywords, "cached": cached}
+                         for key, keywords, cached in await tag_texts(action.texts)]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch keyword extraction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch keyword extraction failed: {str(e)}")
+
+async def run_pdf(digest: str, filename: str, requested: List[str], report=no_report):
+    """
+    Produce the requested outputs of an uploaded PDF, stored as `<digest>.pdf`.
+    A PDF with the same content hash is never converted again; only its missing outputs are filled in.
+    Shared by the endpoint and its job, and safe to retry.
+    """
+    existing = await nlp_db.fetchone(
+        "SELECT id, filename, markdown, entities, computed_fields FROM pdfs WHERE content_hash = ?", (digest,))
+    if existing is not None:
+        markdown_text = existing["markdown"]
+        entities = json.loads(existing["entities"]) if existing["entities"] else None
+        computed_fields = json.loads(existing["computed_fields"]) if existing["computed_fields"] else PDF_FIELDS
+        if "entities" in requested and "entities" not in computed_fields:
+            await report(0.5, "extracting entities")
+            entities = await nlp_pool.run(pdf_entities, markdown_text)
+            computed_fields = computed_fields + ["entities"]
+            async with nlp_db.transaction() as conn:
+                await conn.execute("UPDATE pdfs SET entities = ?, computed_fields = ? WHERE id = ?",
+                                   (json.dumps(entities), json.dumps(computed_fields), existing["id"]))
+                await save_entities(conn, "pdf", existing["id"], entities)
+        outputs = {"markdown": markdown_text, "entities": entities}
+        return {
+            "message": f"{filename} was already processed as {existing['filename']}",
+            "duplicate": True,
+            **{field: outputs[field] for field in requested},
+        }
+
+    await report(0.1, "converting")
+    markdown_text = await PdfService.to_markdown(os.path.join(UPLOAD_DIRECTORY, f"{digest}.pdf"))
+    entities = None
+    if "entities" in requested:
+        await report(0.5, "extracting entities")
+        entities = await nlp_pool.run(pdf_entities, markdown_text)
+    computed_fields = ["markdown"] + [field for field in requested if field != "markdown"]
+
+    # Save to SQLite
+    await report(0.9, "saving")
+    async with nlp_db.transaction() as conn:
+        # An identical PDF stored meanwhile by a concurrent upload keeps its row
+        cursor = await conn.execute('''INSERT INTO pdfs (filename, markdown, entities, computed_fields, content_hash)
+                                       VALUES (?, ?, ?, ?, ?)
+                                       ON CONFLICT (content_hash) DO NOTHING''',
+                                    (filename, markdown_text,
+                                     json.dumps(entities) if entities is not None else None,
+                                     json.dumps(computed_fields), digest))
+        if cursor.rowcount:
+            await save_entities(conn, "pdf", cursor.lastrowid, entities)
+
+    outputs = {"markdown": markdown_text, "entities": entities}
+    return {
+        "message": f"Successfully uploaded {filename}",
+        "duplicate": False,
+        **{field: outputs[field] for field in requested},
+    }
+
+@job_queue.handler("pdf")
+async def pdf_job(payload: dict, report):
+    return await run_pdf(payload["digest"], payload["filename"], payload["fields"], report)
+
 @router.post("/nlp/pdf-reader/")
-async def upload_pdf(file: UploadFile = File(...)):
+async def upload_pdf(file: UploadFile = File(...), fields: Optional[List[str]] = Query(None),
+                     background: bool = False):
     if file.content_type != "application/pdf" or not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
+    unknown = set(fields or []) - set(PDF_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
     try:
-        file_path = os.path.join(UPLOAD_DIRECTORY, file.filename)
-        with open(file_path, "wb") as f:
-            f.write(file.file.read())
-        markdown_text = pymupdf4llm.to_markdown(file_path)
-        doc = nlp(markdown_text)
-        entities = filter_entities(doc)
-
-        # Save to SQLite
-        conn = sqlite3.connect(DATABASE)
-        c = conn.cursor()
-        c.execute('''INSERT OR REPLACE INTO pdfs (filename, markdown, entities) 
-                    VALUES (?, ?, ?)''', 
-                 (file.filename, markdown_text, json.dumps(entities)))
-        conn.commit()
-        conn.close()
+        requested = fields or PDF_FIELDS
+        temp_path, digest = await PdfService.save_upload(file, UPLOAD_DIRECTORY)
+        # Files are kept by content hash, so equal filenames never overwrite each other
+        file_path = os.path.join(UPLOAD_DIRECTORY, f"{digest}.pdf")
+        if os.path.exists(file_path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, file_path)
 
-        return {
-            "message": f"Successfully uploaded {file.filename}",
-            "markdown": markdown_text,
-            "entities": entities
-        }
+        if background:
+            job_id = await job_queue.submit("pdf", {"digest": digest, "filename": file.filename, "fields": requested})
+            return {"job_id": job_id}
+        return await run_pdf(digest, file.filename, requested)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error processing PDF: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing the file: {str(e)}")
     finally:
-        file.file.close()
+        await file.close()
+
+@router.get("/nlp/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status, progress and, once finished, the result or error of a background job."""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"data": {key: value for key, value in job.items() if key != "payload"}}
 
 # New endpoints to list saved data
+def encode_cursor(row) -> str:
+    return base64.urlsafe_b64encode(json.dumps([row["created_at"], row["id"]]).encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return created_at, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def listing_columns(table: str, fields):
+    """Validated column list for a listing; `id` and `created_at` are always kept for the cursor."""
+    listing = LISTINGS[table]
+    if not fields:
+        return listing["default"]
+    unknown = set(fields) - set(listing["columns"])
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ["id", "created_at"] + [column for column in listing["columns"]
+                                   if column in fields and column not in ("id", "created_at")]
+
+def decode_row(table: str, row) -> dict:
+    item = dict(row)
+    for column in LISTINGS[table]["json"]:
+        if column in item:
+            item[column] = json.loads(item[column]) if item[column] else None
+    return item
+
+async def list_page(table: str, fields, limit: int, cursor: Optional[str]):
+    """One keyset page, newest first, reading only the projected columns."""
+    columns = listing_columns(table, fields)
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    params = []
+    if cursor:
+        query += " WHERE (created_at, id) < (?, ?)"
+        params.extend(decode_cursor(cursor))
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    # One extra row tells whether another page exists
+    params.append(limit + 1)
+
+    rows = await nlp_db.fetchall(query, tuple(params))
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {"data": [decode_row(table, row) for row in rows[:limit]], "next_cursor": next_cursor}
+
+def export_rows(table: str, fields, cursor: Optional[str]):
+    """
+    Stream every row (from `cursor` on) as NDJSON, in constant memory.
+    Rows are read in keyset chunks, each with a pooled connection that is given back before the chunk
+    is sent, so a slow or huge export neither holds a connection nor a read transaction for its whole length.
+    Exports are meant as full dumps, so without a projection every column is included.
+    """
+    columns = listing_columns(table, fields or LISTINGS[table]["columns"])
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    position = decode_cursor(cursor) if cursor else None
+
+    async def lines():
+        nonlocal position
+        while True:
+            if position is None:
+                rows = await nlp_db.fetchall(f"{query} ORDER BY created_at DESC, id DESC LIMIT ?",
+                                             (EXPORT_CHUNK_SIZE,))
+            else:
+                rows = await nlp_db.fetchall(f"{query} WHERE (created_at, id) < (?, ?) "
+                                             f"ORDER BY created_at DESC, id DESC LIMIT ?",
+                                             (*position, EXPORT_CHUNK_SIZE))
+            for row in rows:
+                yield json.dumps(decode_row(table, row)) + "\n"
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                return
+            position = (rows[-1]["created_at"], rows[-1]["id"])
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def list_or_export(table: str, fields, limit: int, cursor: Optional[str], format: str):
+    if format == "ndjson":
+        return export_rows(table, fields, cursor)
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    return await list_page(table, fields, limit, cursor)
+
 @router.get("/nlp/articles")
-async def list_articles():
+async def list_articles(limit: int = LIST_DEFAULT_LIMIT, cursor: Optional[str] = None,
+                        fields: Optional[List[str]] = Query(None), format: str = "json"):
     try:
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM articles ORDER BY created_at DESC")
-        articles = [dict(row) for row in c.fetchall()]
-        for article in articles:
-            article['data'] = json.loads(article['data'])
-        conn.close()
-        return {"data": articles}
+        return await list_or_export("articles", fields, limit, cursor, format)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing articles: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error listing articles: {str(e)}")
 
 @router.get("/nlp/tags")
-async def list_tags():
+async def list_tags(limit: int = LIST_DEFAULT_LIMIT, cursor: Optional[str] = None,
+                    fields: Optional[List[str]] = Query(None), format: str = "json"):
     try:
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM tags ORDER BY created_at DESC")
-        tags = [dict(row) for row in c.fetchall()]
-        for tag in tags:
-            tag['keywords'] = json.loads(tag['keywords'])
-        conn.close()
-        return {"data": tags}
+        return await list_or_export("tags", fields, limit, cursor, format)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing tags: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error listing tags: {str(e)}")
 
 @router.get("/nlp/pdfs")
-async def list_pdfs():
+async def list_pdfs(limit: int = LIST_DEFAULT_LIMIT, cursor: Optional[str] = None,
+                    fields: Optional[List[str]] = Query(None), format: str = "json"):
     try:
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        c.execute("SELECT * FROM pdfs ORDER BY created_at DESC")
-        pdfs = [dict(row) for row in c.fetchall()]
-        for pdf in pdfs:
-            pdf['entities'] = json.loads(pdf['entities'])
-        conn.close()
-        return {"data": pdfs}
+        return await list_or_export("pdfs", fields, limit, cursor, format)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing PDFs: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error listing PDFs: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error listing PDFs: {str(e)}")
+
+def fts_query(q: str, syntax: bool) -> str:
+    """Quote every term unless the caller asked for raw FTS5 syntax, so user input cannot break the query."""
+    if syntax:
+        return q
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+@router.get("/nlp/search")
+async def search(q: str, type: str = "articles", limit: int = 20, offset: int = 0, syntax: bool = False):
+    """
+    Ranked full-text search over stored articles (title, text) or PDFs (markdown).
+    Results are ordered by BM25 and carry a highlighted snippet.
+    """
+    if type not in SEARCH_SOURCES:
+        raise HTTPException(status_code=400, detail=f"type must be one of: {', '.join(SEARCH_SOURCES)}")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    table, columns, weights = SEARCH_SOURCES[type]
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    try:
+        rows = await nlp_db.fetchall(f'''
+            SELECT {", ".join(f"d.{column}" for column in columns)},
+                   snippet({table}_fts, -1, '<mark>', '</mark>', '…', 24) AS snippet,
+                   bm25({table}_fts, {weights}) AS score
+            FROM {table}_fts JOIN {table} d ON d.id = {table}_fts.rowid
+            WHERE {table}_fts MATCH ?
+            ORDER BY score
+            LIMIT ? OFFSET ?''', (fts_query(q, syntax), limit + 1, max(0, offset)))
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {str(e)}")
+
+    return {
+        "data": [dict(row) for row in rows[:limit]],
+        "next_offset": offset + limit if len(rows) > limit else None,
+    }
+
+@router.get("/nlp/entities/documents")
+async def entity_documents(text: str, label: Optional[str] = None, type: Optional[str] = None,
+                           limit: int = LIST_DEFAULT_LIMIT, offset: int = 0):
+    """Documents that mention an entity, matched on its normalized text (and label, if given)."""
+    if type and type not in DOC_TYPES:
+        raise HTTPException(status_code=400, detail=f"type must be one of: {', '.join(DOC_TYPES)}")
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    return {"data": await entity_store.documents(text, label, type, limit, max(0, offset))}
+
+@router.get("/nlp/entities/top")
+async def top_entities(label: Optional[str] = None, type: Optional[str] = None, limit: int = 10):
+    """Most mentioned entities per label, counted in documents."""
+    if type and type not in DOC_TYPES:
+        raise HTTPException(status_code=400, detail=f"type must be one of: {', '.join(DOC_TYPES)}")
+    return {"data": await entity_store.top(label, type, max(1, min(limit, LIST_MAX_LIMIT)))}
+
+@router.post("/nlp/entities/backfill")
+async def backfill_entities():
+    """Index the entities of documents stored before the entity table existed."""
+    return {"data": await entity_store.backfill()}
+
+@router.get("/nlp/models")
+async def list_models():
+    """Load time and memory footprint of every spaCy pipeline loaded in this worker."""
+    return {"data": {**ModelRegistry.stats(), "pool": nlp_pool.stats(), "process_pool": process_pool.stats()}}
+
+@router.get("/nlp/cache")
+async def cache_stats():
+    """Hit and miss counters of the article result cache."""
+    return {"data": article_cache.stats()}
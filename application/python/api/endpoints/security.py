@@ -1,13 +1,13 @@
-import sqlite3
-from http.client import HTTPException
-from typing import Optional
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi_versioning import VersionedFastAPI, version
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session
 
-from dto.pocs.alerts_dto import PocResponseDTO
+from dto.pocs.alerts_dto import PocBulkResponseDTO, PocResponseDTO
 from dto.scans.scan_dtos import (
     ScanResponseDTO,
     ScanListDTO,
@@ -17,17 +17,18 @@ from dto.scans.scan_dtos import (
     AnalysisDTO,
 )
 from pydantic import BaseModel
-import spacy
 
+from services.scan_analysis import ScanAnalyzer
 from services.spider_foot_service import SpiderFootService
+from services.storage import nlp_db
+from services.orm import alerts_orm
 from services.poc_service import PocService
 
+logger = logging.getLogger(__name__)
+
 # Initialize Router
 router = APIRouter()
 
-# Load SpaCy Model
-nlp = spacy.load("en_core_web_trf")
-nlp.max_length = 10000000
 # Request Models
 class ScanRequest(BaseModel):
     target: str
@@ -38,14 +39,23 @@ class CheckScan(BaseModel):
     scanId: str
 
 
+class CveBulkRequest(BaseModel):
+    cve_ids: List[str]
+    min_stars: Optional[int] = None
+    per_cve: Optional[int] = None
+
+
+POC_BULK_MAX = int(os.getenv("POC_BULK_MAX", "5000"))
 EXCLUDED_ENTITY_TYPES = {"PERCENT", "MONEY", "QUANTITY", "ORDINAL", "CARDINAL"}
 
+scan_analyzer = ScanAnalyzer(nlp_db)
+
 
 @router.post("/scan", response_model=ScanResponseDTO)
 @version(1)
 async def scan(request: ScanRequest):
     # Start Scan
-    result = SpiderFootService.start_scan(request.target, request.client)
+    result = await SpiderFootService.start_scan(request.target, request.client)
     # Return Response
     return ScanResponseDTO(
         target=request.target,
@@ -60,9 +70,9 @@ async def scan(request: ScanRequest):
 @version(1)
 async def scan(request: ScanRequest):
     # Stop Scan
-    result = SpiderFootService.stop_scan(request.target)
+    result = await SpiderFootService.stop_scan(request.target)
     # Return Response
-    return result.json()
+    return result
 
 
 
@@ -70,10 +80,10 @@ async def scan(request: ScanRequest):
 @router.post("/scan/delete")
 @version(1)
 async def scan(request: ScanRequest):
-    # Stop Scan
-    result = SpiderFootService.delete_scan(request.target)
+    # Delete Scan
+    result = await SpiderFootService.delete_scan(request.target)
     # Return Response
-    return result.json()
+    return result
 
 
 
@@ -81,8 +91,7 @@ async def scan(request: ScanRequest):
 @router.get("/scan/list", response_model=ScanListDTO)
 @version(1)
 async def scan_list():
-    result = SpiderFootService.get_scan_list()
-    print(result)
+    result = await SpiderFootService.get_scan_list()
 
     # Map each sublist to a dictionary
     events = [
@@ -110,7 +119,7 @@ async def scan_list():
 @router.post("/scan/options", response_model=ScanOptionsDTO)
 @version(1)
 async def scan_options(request: CheckScan):
-    result = SpiderFootService.get_scan_options(request.scanId)
+    result = await SpiderFootService.get_scan_options(request.scanId)
     return ScanOptionsDTO(
         scanId=request.scanId,
         status=200,
@@ -121,7 +130,7 @@ async def scan_options(request: CheckScan):
 @router.post("/scan/graphic", response_model=ScanGraphicsDTO)
 @version(1)
 async def scan_graphic(request: CheckScan):
-    result = SpiderFootService.get_scan_graphics(request.scanId)
+    result = await SpiderFootService.get_scan_graphics(request.scanId)
     return ScanGraphicsDTO(
         scanId=request.scanId,
         status=200,
@@ -132,68 +141,73 @@ async def scan_graphic(request: CheckScan):
 @router.post("/scan/events")
 @version(1)
 async def scan_events(request: CheckScan):
-    result = SpiderFootService.get_scan_events(request.scanId)
-    #print(result)
+    result = await SpiderFootService.get_scan_events(request.scanId)
     return {
         "status": 200,
-        "events": result.json()
+        "events": result
     }
 
 
-# Updated Endpoint
 @router.post("/scan/analyze")
 @version(1)
 async def analyze_scan(request: CheckScan):
     """
     Analyze scan results using spaCy for Named Entity Recognition (NER).
+    Events are streamed from SpiderFoot and only those added since the last run are analyzed.
     """
-    
     try:
-        results = SpiderFootService.get_scan_events(request.scanId)
-
-        for event in results.json():
-            print(event)
-        
-        # Add the "spacy_setfit" pipeline component to the spaCy model, and configure it with SetFit parameters
-        doc = nlp(results.text)
-
-        # Return formatted response
-        return {
-            "status": 200,
-            "events": results.json(),
-            "doc": doc.ents
-        }
+        events = SpiderFootService.stream_scan_events(request.scanId)
+        result = await scan_analyzer.analyze(request.scanId, events)
+        return {"status": 200, **result}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException()
+        logger.error(f"Error analyzing scan: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error analyzing scan: {str(e)}")
+
+
+@router.post("/scan/analysis")
+@version(1)
+async def scan_analysis(request: CheckScan):
+    """Stored analysis of a scan, without contacting SpiderFoot."""
+    return {"status": 200, **await scan_analyzer.results(request.scanId)}
 
 
 @router.get("/pocs", response_model=PocResponseDTO)
+@router.get("/alerts", response_model=PocResponseDTO)
 @version(1)
 async def get_pocs(
         limit: int = 10,
         cve_id: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        date_field: str = "pushed_at",
+        min_stars: Optional[int] = None,
+        sort: str = "pushed_at",
+        order: str = "desc",
+        cursor: Optional[str] = None,
+        session: AsyncSession = Depends(alerts_orm.session),
 ):
-    pocs = PocService.get_pocs(limit=limit, cve_id=cve_id)
-    
-    serialized_pocs = [poc.model_dump() for poc in pocs]  # Use `.dict()` for Pydantic v1
-
+    pocs, next_cursor = await PocService.get_pocs(session, limit=limit, cve_id=cve_id, since=since, until=until,
+                                                  date_field=date_field, min_stars=min_stars, sort=sort,
+                                                  order=order, cursor=cursor)
     return PocResponseDTO(
         status=200,
-        data=serialized_pocs
+        data=pocs,
+        next_cursor=next_cursor,
     )
 
 
-#TODO : Add support for `cve_id`
-@router.get("/alerts", response_model=PocResponseDTO)
+@router.post("/pocs/bulk", response_model=PocBulkResponseDTO)
 @version(1)
-async def get_pocs(
-        limit: int = 10,
-        cve_id: Optional[str] = None,
-):
-    pocs = PocService.get_pocs(limit=limit, cve_id=cve_id)
-    serialized_pocs = [poc.model_dump() for poc in pocs]  # Use `.dict()` for Pydantic v1
-
-    return PocResponseDTO(
+async def get_pocs_bulk(request: CveBulkRequest, session: AsyncSession = Depends(alerts_orm.session)):
+    """POCs of up to `POC_BULK_MAX` CVEs in one call, keyed by CVE id."""
+    if len(request.cve_ids) > POC_BULK_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {POC_BULK_MAX} CVE ids per request")
+    pocs = await PocService.get_pocs_for_cves(session, request.cve_ids, min_stars=request.min_stars,
+                                              per_cve=request.per_cve)
+    return PocBulkResponseDTO(
         status=200,
-        data=serialized_pocs
+        data=pocs,
+        missing=[cve_id for cve_id, found in pocs.items() if not found],
     )
@@ -0,0 +1,67 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from classes.TextSummarizer import sentence_text
+
+SENTIMENT_WEIGHT = float(os.getenv("SENTIMENT_WEIGHT", "0.5"))
+SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "65536"))
+# Sentences repeat (boilerplate, quotes, bylines); whole documents rarely do and would bloat the cache
+SENTIMENT_CACHE_MAX_CHARS = int(os.getenv("SENTIMENT_CACHE_MAX_CHARS", "1000"))
+POLARITY_FIELDS = ("neg", "neu", "pos", "compound")
+COMPOUND = POLARITY_FIELDS.index("compound")
+
+
+@lru_cache(maxsize=None)
+def get_analyzer():
+    """One VADER analyzer per process: building it parses the lexicon files."""
+    return SentimentIntensityAnalyzer()
+
+
+def _score(text):
+    scores = get_analyzer().polarity_scores(text)
+    return tuple(scores[field] for field in POLARITY_FIELDS)
+
+
+_cached_score = lru_cache(maxsize=SENTIMENT_CACHE_SIZE)(_score)
+
+
+def polarity(text):
+    """VADER (neg, neu, pos, compound) of a text; short texts are memoized."""
+    return _cached_score(text) if len(text) <= SENTIMENT_CACHE_MAX_CHARS else _score(text)
+
+
+def polarity_scores(text):
+    """Drop-in for `SentimentIntensityAnalyzer.polarity_scores`."""
+    return dict(zip(POLARITY_FIELDS, polarity(text)))
+
+
+def polarity_matrix(texts):
+    """Texts (or spaCy spans) x POLARITY_FIELDS array of scores."""
+    return np.array([polarity(sentence_text(text)) for text in texts], dtype=np.float64).reshape(-1, len(POLARITY_FIELDS))
+
+
+def document_polarities(documents):
+    """Sentence polarities of many documents in one pass: one (sentences x POLARITY_FIELDS) array per document."""
+    documents = [list(document) for document in documents]
+    matrix = polarity_matrix([sentence for document in documents for sentence in document])
+    return np.split(matrix, np.cumsum([len(document) for document in documents])[:-1])
+
+
+class SentimentRescoring:
+    """Weights sentence scores by how opinionated each sentence is (absolute VADER compound)."""
+
+    def __init__(self, weight=SENTIMENT_WEIGHT):
+        self.sentiment_weight = weight
+
+    # Score of one sentence, boosted by up to `weight` for strongly positive or negative ones
+    def rescore_sentiment(self, text, score):
+        return score * (1 + self.sentiment_weight * abs(polarity(sentence_text(text))[COMPOUND]))
+
+    # Vectorized form: `scores[i]` belongs to `sentences[i]`; pass `compound` when already computed
+    def rescore_sentiments(self, sentences, scores, compound=None):
+        if compound is None:
+            compound = polarity_matrix(sentences)[:, COMPOUND]
+        return scores * (1 + self.sentiment_weight * np.abs(compound))
@@ -1,154 +1,155 @@
-import sys
-import math
-import bs4 as bs
-import urllib.request
+import logging
+import os
 import re
+from functools import lru_cache
+
 import nltk
+import numpy as np
 from nltk.stem import WordNetLemmatizer
-import spacy
-from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse
+from spacy.lang.en.stop_words import STOP_WORDS
+
+logger = logging.getLogger(__name__)
+
+# WordNet is read from local data (installed at build time), never downloaded at runtime
+APP_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NLTK_DATA = os.getenv("NLTK_DATA", os.path.join(APP_DIRECTORY, "nltk_data"))
+LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", "65536"))
+if NLTK_DATA not in nltk.data.path:
+    nltk.data.path.insert(0, NLTK_DATA)
 
-# Execute this line if you are running this code for the first time
-nltk.download('wordnet')
+_WORD = re.compile(r"\w+")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
 
 # Initializing few variables
-nlp = spacy.load('en_core_web_trf')
 lemmatizer = WordNetLemmatizer()
+_wordnet_missing = False
 
 
-# Defining TextProcessor Class
-class TextProcessor:
-    def __init__(self, sentences):
-        self.sentences = sentences
-        self.stopWords = nlp.Defaults.stop_words
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize(word):
+    """WordNet lemma of a lower-cased word, for text that did not come from a spaCy parse."""
+    global _wordnet_missing
+    if _wordnet_missing:
+        return word
+    try:
+        return lemmatizer.lemmatize(word)
+    except LookupError:
+        _wordnet_missing = True
+        logger.warning(f"WordNet data not found under {NLTK_DATA}; words are used without lemmatization")
+        return word
 
-    # Function to calculate frequency of word in each sentence
-    def frequency_matrix(self):
-        freq_matrix = {}
 
-        for sent in self.sentences:
-            freq_table = {}  # dictionary with 'words' as key and their 'frequency' as value
+def sentence_text(sent):
+    return sent if isinstance(sent, str) else sent.text
 
-            # Getting all words from the sentence in lower case
-            words = [word.text.lower() for word in sent if word.text.isalnum()]
 
-            for word in words:
-                word = lemmatizer.lemmatize(word)  # Lemmatize the word
-                if word not in self.stopWords:  # Reject stopwords
-                    if word in freq_table:
-                        freq_table[word] += 1
-                    else:
-                        freq_table[word] = 1
+def split_sentences(text):
+    """Punctuation/paragraph based sentence split, for summarizing text without a spaCy parse."""
+    return [sentence.strip() for sentence in _SENTENCE_BREAK.split(text) if sentence.strip()]
 
-            freq_matrix[sent[:15]] = freq_table
 
+# Defining TextProcessor Class
+class TextProcessor:
+    """
+    Extractive TF-IDF summarizer. Sentence `i` is row `i` of every matrix, and words are columns,
+    so the whole computation is a handful of sparse-matrix operations.
+    """
+
+    def __init__(self, sentences, terms=None):
+        self.sentences = list(sentences)
+        self.stopWords = STOP_WORDS
+        self.vocabulary = {}
+        # Words of each sentence, when already extracted (e.g. by a worker process)
+        self.terms = terms
+
+    # Words of every sentence, extracted once
+    def sentences_terms(self):
+        if self.terms is None:
+            self.terms = [self.sentence_terms(sent) for sent in self.sentences]
+        return self.terms
+
+    # Distinct words of the whole text, e.g. to count document frequencies across a corpus
+    def document_vocabulary(self):
+        return list({word for terms in self.sentences_terms() for word in terms})
+
+    # Words of a sentence that count towards its score
+    def sentence_terms(self, sent):
+        if isinstance(sent, str):
+            # Plain text: no parse to take lemmas from
+            words = (lemmatize(word.lower()) for word in _WORD.findall(sent) if word.isalnum())
+        else:
+            # spaCy already computed the lemma of every token
+            words = ((token.lemma_ or lemmatize(token.text.lower())).lower() for token in sent if token.text.isalnum())
+        return [word for word in words if word not in self.stopWords]  # Reject stopwords
+
+    # Sentences x words matrix of word counts
+    def frequency_matrix(self):
+        indices, indptr = [], [0]
+        for terms in self.sentences_terms():
+            indices.extend(self.vocabulary.setdefault(word, len(self.vocabulary)) for word in terms)
+            indptr.append(len(indices))
+        freq_matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float64), np.array(indices, dtype=np.int64), np.array(indptr)),
+            shape=(len(self.sentences), len(self.vocabulary)),
+        )
+        # Repeated words of a sentence become a single entry holding their count
+        freq_matrix.sum_duplicates()
         return freq_matrix
 
-    # Function to calculate Term Frequency (TF) of each word
+    # Term Frequency (TF): count over the number of distinct words in the sentence
     def tf_matrix(self, freq_matrix):
-        tf_matrix = {}
+        distinct_words = np.diff(freq_matrix.indptr)
+        return sparse.diags(1.0 / np.maximum(distinct_words, 1)) @ freq_matrix
 
-        for sent, freq_table in freq_matrix.items():
-            tf_table = {}  # dictionary with 'word' itself as a key and its TF as value
-
-            total_words_in_sentence = len(freq_table)
-            for word, count in freq_table.items():
-                tf_table[word] = count / total_words_in_sentence
-
-            tf_matrix[sent] = tf_table
-
-        return tf_matrix
-
-    # Function to find how many sentences contain a 'word'
+    # Number of sentences containing each word
     def sentences_per_words(self, freq_matrix):
-        sent_per_words = {}
-
-        for sent, f_table in freq_matrix.items():
-            for word, count in f_table.items():
-                if word in sent_per_words:
-                    sent_per_words[word] += 1
-                else:
-                    sent_per_words[word] = 1
-
-        return sent_per_words
-
-    # Function to calculate Inverse Document Frequency (IDF) for each word
-    def idf_matrix(self, freq_matrix, sent_per_words, total_sentences):
-        idf_matrix = {}
-
-        for sent, f_table in freq_matrix.items():
-            idf_table = {}
-
-            for word in f_table.keys():
-                idf_table[word] = math.log10(total_sentences / float(sent_per_words[word]))
+        return np.bincount(freq_matrix.indices, minlength=freq_matrix.shape[1])
 
-            idf_matrix[sent] = idf_table
+    # Inverse Document Frequency (IDF) of each word, sentences being the documents
+    def idf_vector(self, freq_matrix):
+        sent_per_words = self.sentences_per_words(freq_matrix)
+        return np.log10(freq_matrix.shape[0] / np.maximum(sent_per_words, 1))
 
-        return idf_matrix
+    # Tf-Idf score of each word in each sentence
+    def tf_idf_matrix(self, tf_matrix, idf_vector):
+        return tf_matrix @ sparse.diags(idf_vector)
 
-    # Function to calculate Tf-Idf score of each word
-    def tf_idf_matrix(self, tf_matrix, idf_matrix):
-        tf_idf_matrix = {}
-
-        for (sent1, f_table1), (sent2, f_table2) in zip(tf_matrix.items(), idf_matrix.items()):
-
-            tf_idf_table = {}
-
-            # word1 and word2 are the same
-            for (word1, tf_value), (word2, idf_value) in zip(f_table1.items(), f_table2.items()):
-                tf_idf_table[word1] = float(tf_value * idf_value)
-
-            tf_idf_matrix[sent1] = tf_idf_table
-
-        return tf_idf_matrix
-
-    # Function to rate every sentence with some score calculated on the basis of Tf-Idf
+    # Average Tf-Idf of the words of each sentence; NaN for sentences without any
     def score_sentences(self, tf_idf_matrix):
-        sentenceScore = {}
-
-        for sent, f_table in tf_idf_matrix.items():
-            total_tfidf_score_per_sentence = 0
-
-            total_words_in_sentence = len(f_table)
-            for word, tf_idf_score in f_table.items():
-                total_tfidf_score_per_sentence += tf_idf_score
-
-            if total_words_in_sentence != 0:
-                sentenceScore[sent] = total_tfidf_score_per_sentence / total_words_in_sentence
+        distinct_words = np.diff(tf_idf_matrix.indptr)
+        totals = np.asarray(tf_idf_matrix.sum(axis=1)).ravel()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(distinct_words > 0, totals / distinct_words, np.nan)
 
-        return sentenceScore
-
-    # Function calculating average sentence score
+    # Average sentence score
     def average_score(self, sentence_score):
-        total_score = 0
-        for sent in sentence_score:
-            total_score += sentence_score[sent]
-
-        average_sent_score = (total_score / len(sentence_score))
-
-        return average_sent_score
+        scored = sentence_score[~np.isnan(sentence_score)]
+        return float(scored.mean()) if scored.size else 0.0
 
-    # Function to return the summary of the article
+    # Sentences scoring at least `threshold`, in document order
     def create_summary(self, sentence_score, threshold):
-        summary = ''
-
-        for sentence in self.sentences:
-            if sentence[:15] in sentence_score and sentence_score[sentence[:15]] >= threshold:
-                summary += " " + sentence.text
-
-        return summary
-
-    # New function: parallelize processing using multiprocessing
-    def parallelize_processing(self, func, *args):
-        """Process text data in parallel to speed up computations."""
-        with ProcessPoolExecutor() as executor:
-            results = executor.map(func, *args)
-        return list(results)
-
-    # New function: Summarize article based on its TF-IDF scores
-    def summarize_article(self, tf_matrix, idf_matrix):
-        tf_idf = self.tf_idf_matrix(tf_matrix, idf_matrix)
+        selected = np.flatnonzero(sentence_score >= threshold)
+        return " ".join(sentence_text(self.sentences[i]) for i in selected)
+
+    # Summarize article based on its TF-IDF scores; TF and IDF are computed when not given
+    def summarize_article(self, tf_matrix=None, idf_vector=None):
+        freq_matrix = None
+        if tf_matrix is None or idf_vector is None:
+            freq_matrix = self.frequency_matrix()
+        if tf_matrix is None:
+            tf_matrix = self.tf_matrix(freq_matrix)
+        if idf_vector is None:
+            idf_vector = self.idf_vector(freq_matrix)
+        tf_idf = self.tf_idf_matrix(tf_matrix, idf_vector)
         sentence_score = self.score_sentences(tf_idf)
         avg_score = self.average_score(sentence_score)
         summary = self.create_summary(sentence_score, avg_score)
         return summary
+
+    # Summarize against IDF weights computed over a whole corpus instead of this text's sentences
+    def summarize_with_idf(self, idf):
+        freq_matrix = self.frequency_matrix()
+        idf_vector = np.fromiter((idf.get(word, 0.0) for word in self.vocabulary), dtype=np.float64,
+                                 count=len(self.vocabulary))
+        return self.summarize_article(self.tf_matrix(freq_matrix), idf_vector)
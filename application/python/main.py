@@ -49,6 +49,13 @@ from fastapi_versioning import VersionedFastAPI, version
 
 from api.endpoints import security
 from api.endpoints import nlp
+from services.jobs import job_queue
+from services.poc_service import PocService, poc_feed_client
+from services.bbot import bbot_client
+from services.spider_foot_service import spiderfoot_client
+from services.orm import alerts_orm
+from services.storage import nlp_db
+from services.worker_pool import nlp_pool, io_pool, process_pool
 
 
 
@@ -62,5 +69,26 @@ app = VersionedFastAPI(app,version_format='{major}')
 async def root():
     return {"message": "Welcome to the Documents."}
 
+@app.on_event("startup")
+async def startup():
+    # Open the storage pools and run schema setup once per worker
+    await nlp_db.connect()
+    await alerts_orm.connect()
+    job_queue.start()
+    PocService.sync.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await job_queue.stop()
+    await PocService.sync.stop()
+    nlp_pool.shutdown()
+    io_pool.shutdown()
+    process_pool.shutdown()
+    await spiderfoot_client.close()
+    await bbot_client.close()
+    await poc_feed_client.close()
+    await nlp_db.close()
+    await alerts_orm.close()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=1121, reload=True)
\ No newline at end of file
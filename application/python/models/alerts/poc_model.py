@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -6,6 +6,16 @@ Base = declarative_base()
 
 class PocModel(Base):
     __tablename__ = "pocs"
+    __table_args__ = (
+        # Upsert key; its leading column also serves lookups by cve_id
+        Index("idx_pocs_cve_repo", "cve_id", "html_url", unique=True),
+        # Keyset pagination per sort column, and per CVE by push date
+        Index("idx_pocs_pushed_at", "pushed_at", "id"),
+        Index("idx_pocs_updated_at", "updated_at", "id"),
+        Index("idx_pocs_created_at", "created_at", "id"),
+        Index("idx_pocs_stargazers_count", "stargazers_count", "id"),
+        Index("idx_pocs_cve_pushed", "cve_id", "pushed_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cve_id = Column(String, nullable=False)
@@ -19,3 +29,17 @@ class PocModel(Base):
     created_at = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, nullable=True)
     pushed_at = Column(DateTime, nullable=True)
+
+
+class SyncStateModel(Base):
+    __tablename__ = "sync_state"
+
+    name = Column(String, primary_key=True)
+    watermark = Column(DateTime, nullable=True)
+    synced_at = Column(DateTime, nullable=True)
+    # Full copy of the feed, resumable page by page; `watermark` only takes over once it is done
+    backfilled = Column(Boolean, nullable=False, default=False, server_default="0")
+    backfill_page = Column(Integer, nullable=True)
+    backfill_watermark = Column(DateTime, nullable=True)
+    # Newest `updated_at` seen; edits to PoCs pushed long ago are pulled with it
+    updated_watermark = Column(DateTime, nullable=True)
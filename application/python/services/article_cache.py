@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+
+from services.storage import Database
+
+ARTICLE_CACHE_TTL = int(os.getenv("ARTICLE_CACHE_TTL", str(24 * 60 * 60)))
+ARTICLE_CACHE_SIZE = int(os.getenv("ARTICLE_CACHE_SIZE", "256"))
+
+
+def content_hash(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class ArticleCache:
+    """
+    Read-through cache over the `articles` table.
+    An in-memory LRU tier sits in front of SQLite; both honour the same TTL.
+    Lookups go by link first and, once an article is downloaded, by the hash of its text,
+    so the same story under another URL skips the analysis too.
+    """
+
+    def __init__(self, database: Database, ttl: int = ARTICLE_CACHE_TTL, max_entries: int = ARTICLE_CACHE_SIZE):
+        self.database = database
+        self.ttl = ttl
+        self._memory = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._counters = {"memory_hits": 0, "db_hits": 0, "content_hits": 0, "misses": 0, "refreshes": 0}
+
+    def _count(self, counter: str) -> None:
+        self._counters[counter] += 1
+
+    async def _select(self, where: str, value: str) -> Optional[Dict[str, Any]]:
+        row = await self.database.fetchone(
+            f"SELECT data FROM articles WHERE {where} = ? AND created_at >= datetime('now', ?)",
+            (value, f"-{self.ttl} seconds"),
+        )
+        return json.loads(row[0]) if row else None
+
+    async def get(self, link: str) -> Optional[Dict[str, Any]]:
+        """Cached record for `link`, or None."""
+        data = self._memory.get(link)
+        if data is not None:
+            self._count("memory_hits")
+            return data
+
+        data = await self._select("link", link)
+        if data is None:
+            return None
+        self._count("db_hits")
+        self.put(link, data)
+        return data
+
+    async def get_by_content(self, digest: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Link and cached record of any article whose text hashes to `digest`."""
+        row = await self.database.fetchone(
+            "SELECT link, data FROM articles WHERE content_hash = ? AND created_at >= datetime('now', ?)",
+            (digest, f"-{self.ttl} seconds"),
+        )
+        if row is None:
+            return None
+        self._count("content_hits")
+        return row[0], json.loads(row[1])
+
+    def miss(self) -> None:
+        """Record a lookup that ended in a full recomputation."""
+        self._count("misses")
+
+    def put(self, link: str, data: Dict[str, Any]) -> None:
+        self._memory[link] = data
+
+    def invalidate(self, link: str) -> None:
+        self._count("refreshes")
+        self._memory.pop(link, None)
+
+    def stats(self) -> Dict[str, Any]:
+        counters = dict(self._counters)
+        entries = len(self._memory)
+        hits = counters["memory_hits"] + counters["db_hits"] + counters["content_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            **counters,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": entries,
+            "memory_capacity": self._memory.maxsize,
+            "ttl": self.ttl,
+        }
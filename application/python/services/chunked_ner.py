@@ -0,0 +1,123 @@
+import os
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from spacy.language import Language
+
+from services.model_registry import get_nlp
+
+NER_CHUNK_CHARS = int(os.getenv("NER_CHUNK_CHARS", "20000"))
+NER_MEMORY_BUDGET_MB = int(os.getenv("NER_MEMORY_BUDGET_MB", "1024"))
+# Rough peak working memory of the transformer pipeline per input character
+NER_BYTES_PER_CHAR = int(os.getenv("NER_BYTES_PER_CHAR", "12000"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Entity(NamedTuple):
+    label: str
+    text: str
+    start_char: int
+    end_char: int
+
+
+def _split(text: str, start: int, end: int, pattern: re.Pattern) -> Iterator[Tuple[int, int]]:
+    position = start
+    for match in pattern.finditer(text, start, end):
+        if match.start() > position:
+            yield position, match.start()
+        position = match.end()
+    if position < end:
+        yield position, end
+
+
+def _pieces(text: str, max_chars: int) -> Iterator[Tuple[int, int]]:
+    """Spans no longer than `max_chars`, cut at paragraph, then sentence, then word boundaries."""
+    for paragraph in _split(text, 0, len(text), _PARAGRAPH_BREAK):
+        if paragraph[1] - paragraph[0] <= max_chars:
+            yield paragraph
+            continue
+        for sentence in _split(text, *paragraph, _SENTENCE_BREAK):
+            if sentence[1] - sentence[0] <= max_chars:
+                yield sentence
+                continue
+            # A single run-on "sentence": fall back to word boundaries, then a hard cut
+            start, end = sentence
+            while end - start > max_chars:
+                cut = start + max_chars
+                space = text.rfind(" ", start, cut)
+                cut = space if space > start else cut
+                yield start, cut
+                start = cut
+                while start < end and text[start].isspace():
+                    start += 1
+            if start < end:
+                yield start, end
+
+
+def chunk_text(text: str, max_chars: int = NER_CHUNK_CHARS) -> Iterator[Tuple[int, str]]:
+    """
+    Pack consecutive paragraphs/sentences into chunks of at most `max_chars`.
+    Yields `(offset, chunk)` so entity offsets can be mapped back onto `text`.
+    """
+    chunk_start = chunk_end = None
+    for start, end in _pieces(text, max_chars):
+        if chunk_start is not None and end - chunk_start > max_chars:
+            yield chunk_start, text[chunk_start:chunk_end]
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start = start
+        chunk_end = end
+    if chunk_start is not None:
+        yield chunk_start, text[chunk_start:chunk_end]
+
+
+def batch_size_for_budget(max_chars: int = NER_CHUNK_CHARS, budget_mb: int = NER_MEMORY_BUDGET_MB) -> int:
+    """How many chunks `nlp.pipe` may hold at once without exceeding the memory budget."""
+    return max(1, (budget_mb * 1024 * 1024) // (max_chars * NER_BYTES_PER_CHAR))
+
+
+def extract_entities(text: str, nlp: Optional[Language] = None, max_chars: int = NER_CHUNK_CHARS,
+                     excluded: Iterable[str] = ()) -> List[Entity]:
+    """
+    Named entities of an arbitrarily long text, in bounded memory.
+    Chunks are streamed through `nlp.pipe` in budget-sized batches, each `Doc` is dropped as soon
+    as its entities are read, and offsets are shifted back onto the original text.
+    """
+    return extract_entities_batch([text], nlp, max_chars, excluded)[0]
+
+
+def extract_entities_batch(texts: Sequence[str], nlp: Optional[Language] = None, max_chars: int = NER_CHUNK_CHARS,
+                           excluded: Iterable[str] = ()) -> List[List[Entity]]:
+    """
+    Entities of many texts at once, one list per text. The chunks of all texts share the same
+    `nlp.pipe` stream, so a batch of short texts costs a few transformer passes instead of one each.
+    """
+    nlp = nlp or get_nlp()
+    excluded = set(excluded)
+    positions = []
+
+    def chunks():
+        for index, text in enumerate(texts):
+            for offset, chunk in chunk_text(text, max_chars):
+                positions.append((index, offset))
+                yield chunk
+
+    entities: List[List[Entity]] = [[] for _ in texts]
+    # Short texts make for short chunks, so more of them fit in the same budget
+    longest = min(max_chars, max((len(text) for text in texts), default=1) or 1)
+    for position, doc in enumerate(nlp.pipe(chunks(), batch_size=batch_size_for_budget(longest))):
+        index, offset = positions[position]
+        entities[index].extend(
+            Entity(ent.label_, ent.text, ent.start_char + offset, ent.end_char + offset)
+            for ent in doc.ents if ent.label_ not in excluded
+        )
+        del doc
+    return entities
+
+
+def unique_entities(entities: Iterable[Entity]) -> List[Tuple[str, str]]:
+    """Deduplicated `(label, text)` pairs, in order of first mention."""
+    return list(dict.fromkeys((entity.label, entity.text) for entity in entities))
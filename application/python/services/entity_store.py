@@ -0,0 +1,123 @@
+import json
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import aiosqlite
+
+from services.storage import Database
+
+logger = logging.getLogger(__name__)
+
+DOC_TYPES = ("article", "pdf")
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = "\"'“”‘’.,;:!?()[]{}<>"
+
+
+def normalize_entity(text: str) -> str:
+    """Case-folded, NFKC-normalized entity text with collapsed whitespace and no surrounding punctuation."""
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE.sub(" ", text).strip().strip(_EDGE_PUNCTUATION).strip().casefold()
+
+
+def entity_rows(doc_type: str, doc_id: int, entities: Iterable[Sequence[str]]) -> List[tuple]:
+    rows = {}
+    for label, text in entities:
+        norm_text = normalize_entity(text)
+        if norm_text:
+            rows.setdefault((label, norm_text), (doc_type, doc_id, label, text, norm_text))
+    return list(rows.values())
+
+
+async def save_entities(conn: aiosqlite.Connection, doc_type: str, doc_id: int,
+                        entities: Optional[Iterable[Sequence[str]]]) -> None:
+    """Write the `(label, text)` pairs of one document; meant to run inside the document's transaction."""
+    if not entities:
+        return
+    await conn.executemany('''INSERT OR IGNORE INTO entities (doc_type, doc_id, label, text, norm_text)
+                              VALUES (?, ?, ?, ?, ?)''', entity_rows(doc_type, doc_id, entities))
+
+
+class EntityStore:
+    """Index-backed queries over the normalized `entities` table."""
+
+    def __init__(self, database: Database):
+        self.database = database
+
+    async def documents(self, text: str, label: Optional[str] = None, doc_type: Optional[str] = None,
+                        limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Documents mentioning an entity, newest first."""
+        query = '''SELECT e.doc_type, e.doc_id, e.label, e.text,
+                          COALESCE(a.title, p.filename) AS title, a.link,
+                          COALESCE(a.created_at, p.created_at) AS created_at
+                   FROM entities e
+                   LEFT JOIN articles a ON e.doc_type = 'article' AND a.id = e.doc_id
+                   LEFT JOIN pdfs p ON e.doc_type = 'pdf' AND p.id = e.doc_id
+                   WHERE e.norm_text = ?'''
+        params: list = [normalize_entity(text)]
+        if label:
+            query += " AND e.label = ?"
+            params.append(label)
+        if doc_type:
+            query += " AND e.doc_type = ?"
+            params.append(doc_type)
+        query += " ORDER BY created_at DESC, e.doc_id DESC LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        return [dict(row) for row in await self.database.fetchall(query, tuple(params))]
+
+    async def top(self, label: Optional[str] = None, doc_type: Optional[str] = None,
+                  limit: int = 10) -> Dict[str, List[Dict[str, Any]]]:
+        """Most frequently mentioned entities (by number of documents), grouped per label."""
+        where, params = [], []
+        if label:
+            where.append("label = ?")
+            params.append(label)
+        if doc_type:
+            where.append("doc_type = ?")
+            params.append(doc_type)
+        rows = await self.database.fetchall(f'''
+            SELECT label, norm_text, text, documents FROM (
+                SELECT label, norm_text, MIN(text) AS text, COUNT(*) AS documents,
+                       ROW_NUMBER() OVER (PARTITION BY label ORDER BY COUNT(*) DESC, norm_text) AS position
+                FROM entities
+                {"WHERE " + " AND ".join(where) if where else ""}
+                GROUP BY label, norm_text
+            ) WHERE position <= ?
+            ORDER BY label, documents DESC''', tuple(params + [limit]))
+
+        top: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            top.setdefault(row["label"], []).append(
+                {"text": row["text"], "norm_text": row["norm_text"], "documents": row["documents"]})
+        return top
+
+    async def backfill(self, batch_size: int = 200) -> Dict[str, int]:
+        """
+        Index entities of documents stored before the entity table existed.
+        Works in batches, one transaction each, and can be re-run safely.
+        """
+        counts = {"article": 0, "pdf": 0}
+        sources = {
+            "article": '''SELECT id, json_extract(data, '$.entities') AS entities FROM articles d
+                          WHERE NOT EXISTS (SELECT 1 FROM entities e WHERE e.doc_type = 'article' AND e.doc_id = d.id)
+                            AND json_extract(data, '$.entities') IS NOT NULL AND id > ?
+                          ORDER BY id LIMIT ?''',
+            "pdf": '''SELECT id, entities FROM pdfs d
+                      WHERE NOT EXISTS (SELECT 1 FROM entities e WHERE e.doc_type = 'pdf' AND e.doc_id = d.id)
+                        AND entities IS NOT NULL AND id > ?
+                      ORDER BY id LIMIT ?''',
+        }
+        for doc_type, query in sources.items():
+            last_id = 0
+            while True:
+                rows = await self.database.fetchall(query, (last_id, batch_size))
+                if not rows:
+                    break
+                async with self.database.transaction() as conn:
+                    for row in rows:
+                        await save_entities(conn, doc_type, row["id"], json.loads(row["entities"]))
+                counts[doc_type] += len(rows)
+                last_id = rows[-1]["id"]
+        logger.info(f"Entity backfill indexed {counts['article']} articles and {counts['pdf']} PDFs")
+        return counts
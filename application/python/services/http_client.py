@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed calls and rejects calls for `reset_timeout` seconds.
+    After that a single trial call is let through; its outcome closes or re-opens the circuit,
+    and a trial that ends any other way (e.g. cancelled) only gives the slot back.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial):
+            raise CircuitOpenError(f"{self.name} is unavailable, retry in {self.reset_timeout:.0f}s")
+        if state == "half-open":
+            self._trial = True
+
+    def success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def release(self) -> None:
+        self._trial = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        self._trial = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            logger.warning(f"Circuit for {self.name} opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "state": self.state, "failures": self.failures}
+
+
+class ServiceClient:
+    """
+    Shared keep-alive `httpx.AsyncClient` for one upstream service, with timeouts,
+    bounded retries with exponential backoff and a circuit breaker.
+    Transport errors and 5xx responses count as failures; other statuses are returned to the caller.
+    """
+
+    def __init__(self, name: str, base_url: str, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = HTTP_READ_TIMEOUT, retries: int = HTTP_RETRIES,
+                 backoff: float = HTTP_RETRY_BACKOFF):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(name)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=HEADERS,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                    max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            )
+        return self._client
+
+    def _error(self, path: str, error: Exception) -> HTTPException:
+        logger.error(f"Request to {self.name} {path} failed: {str(error) or type(error).__name__}")
+        if isinstance(error, httpx.HTTPStatusError):
+            return HTTPException(status_code=502, detail=f"{self.name} error: {error.response.status_code}")
+        status = 504 if isinstance(error, httpx.TimeoutException) else 502
+        return HTTPException(status_code=status, detail=f"{self.name} unreachable")
+
+    async def _attempt(self, path: str, params: Optional[Dict[str, Any]], idempotent: bool,
+                       stream: bool) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                request = self.client.build_request("GET", path, params=params)
+                response = await self.client.send(request, stream=stream)
+                if response.status_code >= 500:
+                    await response.aclose()
+                    raise httpx.HTTPStatusError(f"{self.name} answered {response.status_code}",
+                                                request=request, response=response)
+                return response
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                connect_failed = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                if attempt >= self.retries or not (idempotent or connect_failed):
+                    raise
+                attempt += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+    async def _send(self, path: str, params: Optional[Dict[str, Any]], idempotent: bool,
+                    stream: bool) -> httpx.Response:
+        """One call through the breaker: its retries count as a single success or failure."""
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        try:
+            response = await self._attempt(path, params, idempotent, stream)
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            self.breaker.failure()
+            raise self._error(path, e)
+        finally:
+            # Cancellation or any other error must not keep the half-open trial slot forever
+            self.breaker.release()
+        self.breaker.success()
+        return response
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None,
+                  idempotent: bool = True) -> httpx.Response:
+        """
+        GET `path`, retrying failures up to `retries` times.
+        Non-idempotent calls are only retried when the connection was never established.
+        """
+        return await self._send(path, params, idempotent, stream=False)
+
+    @asynccontextmanager
+    async def stream(self, path: str, params: Optional[Dict[str, Any]] = None):
+        """
+        GET `path` without reading the body, for responses too large to hold in memory.
+        Only establishing the response is retried; a failure halfway through the body is raised.
+        """
+        response = await self._send(path, params, idempotent=True, stream=True)
+        try:
+            yield response
+        except httpx.TransportError as e:
+            self.breaker.failure()
+            raise self._error(path, e)
+        finally:
+            await response.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.breaker.stats(), "base_url": self.base_url}
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
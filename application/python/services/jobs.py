@@ -0,0 +1,273 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from cachetools import TTLCache
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+JOBS_BACKEND = os.getenv("JOBS_BACKEND", "redis")
+JOBS_REDIS_URL = os.getenv("JOBS_REDIS_URL", "redis://localhost:6379/0")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+JOBS_RETRY_DELAY = float(os.getenv("JOBS_RETRY_DELAY", "2"))
+JOBS_RESULT_TTL = int(os.getenv("JOBS_RESULT_TTL", str(24 * 60 * 60)))
+JOBS_MEMORY_MAX = int(os.getenv("JOBS_MEMORY_MAX", "10000"))
+# A taken job whose worker has not written to it for this long is assumed lost and queued again
+JOBS_VISIBILITY_TIMEOUT = float(os.getenv("JOBS_VISIBILITY_TIMEOUT", "120"))
+
+Report = Callable[[float, Optional[str]], Awaitable[None]]
+Handler = Callable[[Dict[str, Any], Report], Awaitable[Any]]
+
+
+class InMemoryBackend:
+    """
+    Single-process backend; jobs live as long as the worker does, and each for `ttl` seconds
+    after its last update. Meant for tests and local runs.
+    """
+
+    def __init__(self, ttl: int = JOBS_RESULT_TTL, max_jobs: int = JOBS_MEMORY_MAX):
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs = TTLCache(maxsize=max_jobs, ttl=ttl)
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    async def push(self, job_id: str) -> None:
+        await self.queue.put(job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["id"]] = job
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    async def processing(self) -> List[str]:
+        # Taken jobs die with the process that runs them; there is nothing to recover
+        return []
+
+    async def ack(self, job_id: str) -> bool:
+        return True
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """
+    Redis list as the queue and one JSON key per job, so any API worker can run or report a job.
+    Taking a job moves it atomically to a processing list, where it stays until it is acknowledged,
+    so a job whose worker died is still known and can be queued again.
+    """
+
+    QUEUE_KEY = "jobs:queue"
+    PROCESSING_KEY = "jobs:processing"
+
+    def __init__(self, url: str = JOBS_REDIS_URL, ttl: int = JOBS_RESULT_TTL):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url, decode_responses=True)
+        self.ttl = ttl
+
+    async def push(self, job_id: str) -> None:
+        await self.client.lpush(self.QUEUE_KEY, job_id)
+
+    async def pop(self, timeout: float) -> Optional[str]:
+        return await self.client.blmove(self.QUEUE_KEY, self.PROCESSING_KEY, max(1, int(timeout)), "RIGHT", "LEFT")
+
+    async def save(self, job: Dict[str, Any]) -> None:
+        await self.client.set(f"jobs:{job['id']}", json.dumps(job), ex=self.ttl)
+
+    async def load(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self.client.get(f"jobs:{job_id}")
+        return json.loads(raw) if raw else None
+
+    async def processing(self) -> List[str]:
+        return await self.client.lrange(self.PROCESSING_KEY, 0, -1)
+
+    async def ack(self, job_id: str) -> bool:
+        """Drop a taken job from the processing list; False if someone else already did."""
+        return await self.client.lrem(self.PROCESSING_KEY, 1, job_id) > 0
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+def retryable(error: Exception) -> bool:
+    """Client errors will fail the same way again; everything else is worth another attempt."""
+    if isinstance(error, HTTPException):
+        return error.status_code >= 500 or error.status_code in (408, 429)
+    return True
+
+
+class JobQueue:
+    """
+    Background jobs with status polling.
+    Handlers are registered per job kind and receive the payload plus a `report(progress, message)` callback.
+    Failed attempts are retried with linear backoff up to `max_attempts`.
+    Running jobs heartbeat; jobs taken by a worker that stopped heartbeating (e.g. its process died)
+    are queued again after `visibility_timeout`, or failed once they are out of attempts.
+    """
+
+    def __init__(self, backend=None, workers: int = JOBS_WORKERS, max_attempts: int = JOBS_MAX_ATTEMPTS,
+                 retry_delay: float = JOBS_RETRY_DELAY, visibility_timeout: float = JOBS_VISIBILITY_TIMEOUT):
+        self.backend = backend
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.visibility_timeout = visibility_timeout
+        self.handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def handler(self, kind: str):
+        def register(func: Handler) -> Handler:
+            self.handlers[kind] = func
+            return func
+        return register
+
+    def _backend(self):
+        if self.backend is None:
+            self.backend = RedisBackend() if JOBS_BACKEND == "redis" else InMemoryBackend()
+        return self.backend
+
+    async def submit(self, kind: str, payload: Dict[str, Any]) -> str:
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind {kind}")
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "payload": payload,
+            "status": "queued",
+            "attempts": 0,
+            "progress": 0.0,
+            "message": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self._backend().save(job)
+        await self._backend().push(job["id"])
+        return job["id"]
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._backend().load(job_id)
+
+    async def _update(self, job: Dict[str, Any], **changes) -> None:
+        job.update(changes, updated_at=time.time())
+        await self._backend().save(job)
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            await self._update(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._attempts(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _attempts(self, job: Dict[str, Any]) -> None:
+        handler = self.handlers[job["kind"]]
+
+        async def report(progress: float, message: Optional[str] = None) -> None:
+            await self._update(job, progress=round(min(max(progress, 0.0), 1.0), 3), message=message)
+
+        while True:
+            await self._update(job, status="running", attempts=job["attempts"] + 1, error=None)
+            try:
+                result = await handler(job["payload"], report)
+            except Exception as e:
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                if job["attempts"] < self.max_attempts and retryable(e):
+                    logger.warning(f"Job {job['id']} attempt {job['attempts']} failed, retrying: {error}")
+                    await self._update(job, status="retrying", error=error)
+                    await asyncio.sleep(self.retry_delay * job["attempts"])
+                    continue
+                logger.error(f"Job {job['id']} failed: {error}")
+                await self._update(job, status="failed", error=error)
+                return
+            await self._update(job, status="succeeded", progress=1.0, result=result)
+            return
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job_id = await self._backend().pop(timeout=5)
+                if job_id is None:
+                    continue
+                job = await self._backend().load(job_id)
+                if job is not None and job["status"] == "queued":
+                    await self._run(job)
+                await self._backend().ack(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def reap(self) -> int:
+        """Queue again (or fail) taken jobs whose worker stopped heartbeating; returns how many were recovered."""
+        backend = self._backend()
+        recovered = 0
+        for job_id in await backend.processing():
+            job = await backend.load(job_id)
+            if job is not None and job["status"] not in ("succeeded", "failed") \
+                    and time.time() - job["updated_at"] < self.visibility_timeout:
+                continue
+            # Only the reaper that removes the entry handles the job
+            if not await backend.ack(job_id) or job is None or job["status"] in ("succeeded", "failed"):
+                continue
+            if job["attempts"] >= self.max_attempts:
+                logger.error(f"Job {job_id} failed: its worker stopped responding")
+                await self._update(job, status="failed", error="Worker stopped responding")
+                continue
+            logger.warning(f"Job {job_id} was abandoned by its worker, queueing it again")
+            await self._update(job, status="queued")
+            await backend.push(job_id)
+            recovered += 1
+        return recovered
+
+    async def _reaper(self) -> None:
+        while True:
+            try:
+                await self.reap()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job reaper error: {str(e)}")
+            await asyncio.sleep(self.visibility_timeout / 2)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.backend is not None:
+            await self.backend.close()
+
+
+# Shared queue; handlers are registered by the endpoint modules
+job_queue = JobQueue()
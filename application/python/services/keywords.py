@@ -0,0 +1,44 @@
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+import yake
+from cachetools import LRUCache
+
+KEYWORD_CACHE_SIZE = int(os.getenv("KEYWORD_CACHE_SIZE", "4096"))
+# Settings of stored tags; a tags row is identified by the hash of its text alone
+TAG_NGRAM = int(os.getenv("TAG_NGRAM", "3"))
+TAG_TOP = int(os.getenv("TAG_TOP", "5"))
+
+_results = LRUCache(maxsize=KEYWORD_CACHE_SIZE)
+_results_lock = threading.Lock()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_extractor(language: str = "en", n: int = 1, dedup_lim: float = 0.9, top: int = 5) -> yake.KeywordExtractor:
+    """One extractor per configuration; building one loads its stopword list."""
+    return yake.KeywordExtractor(lan=language, n=n, dedupLim=dedup_lim, top=top)
+
+
+def extract_keywords(text: str, language: str = "en", n: int = 1, dedup_lim: float = 0.9,
+                     top: int = 5) -> List[Tuple[str, float]]:
+    """YAKE keywords, best (lowest score) first; memoized by text hash and configuration."""
+    key = (text_hash(text), language, n, dedup_lim, top)
+    with _results_lock:
+        keywords = _results.get(key)
+    if keywords is None:
+        keywords = sorted(get_extractor(language, n, dedup_lim, top).extract_keywords(text), key=lambda x: x[1])
+        with _results_lock:
+            _results[key] = keywords
+    return list(keywords)
+
+
+def extract_tag_keywords(texts: Sequence[str]) -> List[List[Tuple[str, float]]]:
+    """Keywords of several texts with the stored tags' settings; CPU-bound pure Python, meant for the process pool."""
+    return [extract_keywords(text, n=TAG_NGRAM, top=TAG_TOP) for text in texts]
@@ -0,0 +1,90 @@
+import logging
+import os
+import resource
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import spacy
+from spacy.language import Language
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = os.getenv("SPACY_MODEL", "en_core_web_trf")
+
+
+def _current_rss() -> int:
+    """
+    Resident set size of this process in bytes.
+    Falls back to the peak RSS when /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelRegistry:
+    """Process-wide registry that loads every spaCy pipeline once, on first use."""
+
+    _models: Dict[str, Language] = {}
+    _stats: Dict[str, Dict[str, Any]] = {}
+    _locks: Dict[str, threading.Lock] = {}
+    _registry_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, name: str = DEFAULT_MODEL, max_length: Optional[int] = None) -> Language:
+        """
+        Return the shared pipeline for `name`, loading it if needed.
+        `max_length` only ever raises the pipeline limit, so callers never shrink it for each other.
+        """
+        model = cls._models.get(name)
+        if model is None:
+            with cls._registry_lock:
+                lock = cls._locks.setdefault(name, threading.Lock())
+            with lock:
+                model = cls._models.get(name)
+                if model is None:
+                    model = cls._load(name)
+
+        if max_length and model.max_length < max_length:
+            model.max_length = max_length
+        return model
+
+    @classmethod
+    def _load(cls, name: str) -> Language:
+        rss_before = _current_rss()
+        started = time.perf_counter()
+        model = spacy.load(name)
+        load_seconds = time.perf_counter() - started
+        rss_delta = max(_current_rss() - rss_before, 0)
+
+        cls._stats[name] = {
+            "name": name,
+            "pipeline": model.pipe_names,
+            "load_seconds": round(load_seconds, 3),
+            "memory_bytes": rss_delta,
+            "memory_mb": round(rss_delta / (1024 * 1024), 1),
+            "loaded_at": time.time(),
+        }
+        cls._models[name] = model
+        logger.info(f"Loaded spaCy model {name} in {load_seconds:.1f}s (+{rss_delta / (1024 * 1024):.0f} MB RSS)")
+        return model
+
+    @classmethod
+    def is_loaded(cls, name: str = DEFAULT_MODEL) -> bool:
+        return name in cls._models
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Per-model load time and memory, plus the current process RSS."""
+        return {
+            "models": list(cls._stats.values()),
+            "process_rss_mb": round(_current_rss() / (1024 * 1024), 1),
+        }
+
+
+def get_nlp(name: str = DEFAULT_MODEL, max_length: Optional[int] = None) -> Language:
+    """Shortcut for `ModelRegistry.get`."""
+    return ModelRegistry.get(name, max_length=max_length)
@@ -0,0 +1,90 @@
+import logging
+import os
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
+
+from models.alerts.poc_model import Base, PocModel, SyncStateModel
+from services.storage import STORAGE_BUSY_TIMEOUT_MS
+
+logger = logging.getLogger(__name__)
+
+ALERTS_DATABASE_URL = os.getenv("ALERTS_DATABASE_URL", "sqlite+aiosqlite:///alerts.db")
+CVE_NEWS_DATABASE_URL = os.getenv("CVE_NEWS_DATABASE_URL", "sqlite+aiosqlite:///cve_news.db")
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={STORAGE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def _migrate(connection) -> None:
+    """Bring tables written by the earlier hand-rolled schema in line with the models."""
+    sync_columns = {column["name"] for column in inspect(connection).get_columns("sync_state")}
+    for column in SyncStateModel.__table__.columns:
+        if column.name not in sync_columns:
+            # Existing sync states start with a backfill, which recovers PoCs earlier syncs never reached
+            connection.execute(text(f"ALTER TABLE sync_state ADD COLUMN "
+                                    f"{CreateColumn(column).compile(dialect=connection.dialect)}"))
+    indexes = {index["name"] for index in inspect(connection).get_indexes("pocs")}
+    if "idx_pocs_cve_repo" not in indexes:
+        # One row per (CVE, repository), newest row wins
+        connection.execute(text("DELETE FROM pocs WHERE id NOT IN (SELECT MAX(id) FROM pocs GROUP BY cve_id, html_url)"))
+    for index in PocModel.__table__.indexes:
+        index.create(connection, checkfirst=True)
+    # Dates used to be stored as the feed's ISO strings (and briefly without microseconds). SQLite DateTime
+    # columns hold and are compared as 'YYYY-MM-DD HH:MM:SS.ffffff' text, so every value needs that exact form
+    for table, column in (("pocs", "created_at"), ("pocs", "updated_at"), ("pocs", "pushed_at"),
+                          ("sync_state", "watermark"), ("sync_state", "synced_at")):
+        connection.execute(text(f"UPDATE {table} SET {column} = strftime('%Y-%m-%d %H:%M:%f', {column}) || '000' "
+                                f"WHERE {column} LIKE '%T%' OR length({column}) = 19"))
+
+
+class OrmDatabase:
+    """Async SQLAlchemy engine and session factory for one database; tables are created on connect."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._engine: Optional[AsyncEngine] = None
+        self._sessions: Optional[sessionmaker] = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._engine = create_async_engine(self.url)
+            if self._engine.dialect.name == "sqlite":
+                event.listen(self._engine.sync_engine, "connect", _sqlite_pragmas)
+        return self._engine
+
+    @property
+    def sessions(self) -> sessionmaker:
+        if self._sessions is None:
+            self._sessions = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        return self._sessions
+
+    async def connect(self) -> None:
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+            await connection.run_sync(_migrate)
+        logger.info(f"Connected to {self.url}")
+
+    async def session(self) -> AsyncIterator[AsyncSession]:
+        """Session-per-request dependency: `session: AsyncSession = Depends(alerts_orm.session)`."""
+        async with self.sessions() as session:
+            yield session
+
+    async def close(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = None
+            self._sessions = None
+
+
+alerts_orm = OrmDatabase(ALERTS_DATABASE_URL)
+cve_news_orm = OrmDatabase(CVE_NEWS_DATABASE_URL)
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import List, Tuple
+
+import pymupdf
+import pymupdf4llm
+try:
+    from pymupdf4llm import IdentifyHeaders
+except ImportError:  # newer releases only keep it in the helpers module
+    from pymupdf4llm.helpers.pymupdf_rag import IdentifyHeaders
+from fastapi import UploadFile
+
+from services.worker_pool import io_pool, process_pool
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("PDF_UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "20"))
+
+
+def _analyze(file_path: str) -> Tuple[int, IdentifyHeaders]:
+    # Runs in a worker process: the header font sizes need one scan of the whole document
+    with pymupdf.open(file_path) as document:
+        return document.page_count, IdentifyHeaders(document)
+
+
+def _convert_pages(file_path: str, pages: List[int], headers: IdentifyHeaders) -> str:
+    # Runs in a worker process; shared header levels keep headings consistent across ranges
+    return pymupdf4llm.to_markdown(file_path, pages=pages, hdr_info=headers)
+
+
+class PdfService:
+    """Chunked PDF uploads and page-parallel markdown conversion."""
+
+    @staticmethod
+    async def save_upload(file: UploadFile, directory: str) -> Tuple[str, str]:
+        """
+        Stream an upload to a temporary file in `directory`, hashing it on the way.
+        Disk writes go to the I/O pool so the event loop never blocks on them.
+        Returns the temporary path and the SHA-256 of the content.
+        """
+        digest = hashlib.sha256()
+        fd, temp_path = await io_pool.run(tempfile.mkstemp, dir=directory, suffix=".part")
+        try:
+            out = os.fdopen(fd, "wb")
+            try:
+                while True:
+                    chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    await io_pool.run(out.write, chunk)
+            finally:
+                await io_pool.run(out.close)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return temp_path, digest.hexdigest()
+
+    @staticmethod
+    def page_ranges(page_count: int, pages_per_task: int = PAGES_PER_TASK) -> List[List[int]]:
+        return [list(range(start, min(start + pages_per_task, page_count)))
+                for start in range(0, page_count, pages_per_task)]
+
+    @classmethod
+    async def to_markdown(cls, file_path: str) -> str:
+        """
+        Convert page ranges in parallel across the shared process pool and join them in page order.
+        Every range is subject to the pool's queue limit (503) and task timeout (504).
+        """
+        page_count, headers = await process_pool.run(_analyze, file_path)
+        ranges = cls.page_ranges(page_count)
+        parts = await asyncio.gather(*[process_pool.run(_convert_pages, file_path, pages, headers)
+                                       for pages in ranges])
+        logger.info(f"Converted {page_count} pages of {file_path} in {len(ranges)} parallel ranges")
+        return "".join(parts)
@@ -1,107 +1,304 @@
-import sqlite3
-from typing import Optional
-import requests
+import asyncio
+import base64
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
 from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
 # todo: improve this
 from dto.pocs.alerts_dto import PocDTO
+from models.alerts.poc_model import PocModel, SyncStateModel
+from services.http_client import ServiceClient
+from services.orm import OrmDatabase, alerts_orm
+from services.storage import SQLITE_MAX_PARAMS
 
+logger = logging.getLogger(__name__)
 
-class PocService:
-    BASE_URL = "https://poc-in-github.motikan2010.net/api/v1/"
-    DB_FILE = "alerts.db"
+POC_FEED_URL = os.getenv("POC_FEED_URL", "https://poc-in-github.motikan2010.net/api/v1/")
+POC_SYNC_INTERVAL = int(os.getenv("POC_SYNC_INTERVAL", "3600"))
+POC_SYNC_PAGE_SIZE = int(os.getenv("POC_SYNC_PAGE_SIZE", "100"))
+# The feed is requested newest first by this date field, which is also the one watermarked
+POC_SYNC_SORT = os.getenv("POC_SYNC_SORT", "pushed_at")
+# Second pass, newest first by last update, so edited descriptions and star counts are refreshed too
+POC_UPDATE_SORT = "updated_at"
+
+POC_MAX_LIMIT = int(os.getenv("POC_MAX_LIMIT", "500"))
+POC_SORTS = ("pushed_at", "updated_at", "created_at", "stargazers_count")
+POC_DATE_FIELDS = ("pushed_at", "updated_at", "created_at")
+
+POC_COLUMNS = ("cve_id", "name", "owner", "full_name", "html_url", "description", "stargazers_count",
+               "nvd_description", "created_at", "updated_at", "pushed_at")
+
+poc_feed_client = ServiceClient("PoC feed", POC_FEED_URL)
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Feed timestamps are ISO 8601; stored as naive UTC."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def poc_values(poc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "cve_id": str(poc.get("cve_id", "")),
+        "name": str(poc.get("name", "")),
+        "owner": poc.get("owner"),
+        "full_name": poc.get("full_name"),
+        "html_url": str(poc.get("html_url", "")),
+        "description": poc.get("description"),
+        "stargazers_count": int(poc.get("stargazers_count") or 0),
+        "nvd_description": poc.get("nvd_description"),
+        "created_at": parse_datetime(poc.get("created_at")),
+        "updated_at": parse_datetime(poc.get("updated_at")),
+        "pushed_at": parse_datetime(poc.get("pushed_at")),
+    }
+
+
+def newest(watermark: Optional[datetime], rows: List[Dict[str, Any]], field: str = POC_SYNC_SORT) -> Optional[datetime]:
+    """Latest `field` date among `rows` and `watermark`."""
+    return max([date for date in [watermark] + [row[field] for row in rows] if date is not None], default=None)
+
+
+class PocSync:
+    """
+    Scheduled copy of the PoC feed into a local `pocs` table, upserted on (cve_id, html_url).
+    The first runs backfill the whole feed, resuming from the last stored page after a restart.
+    Later runs pull pages newest first (by POC_SYNC_SORT) until a page has nothing newer than the watermark,
+    then do the same by `updated_at` against a second watermark, which refreshes PoCs edited since.
+    Every page is committed in one transaction together with the sync state.
+    """
+
+    def __init__(self, database: OrmDatabase, name: str = "pocs", interval: int = POC_SYNC_INTERVAL,
+                 page_size: int = POC_SYNC_PAGE_SIZE):
+        self.database = database
+        self.name = name
+        self.interval = interval
+        self.page_size = page_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def fetch_page(self, page: int, sort: str = POC_SYNC_SORT) -> List[Dict[str, Any]]:
+        response = await poc_feed_client.get("", params={"limit": self.page_size, "sort": sort, "page": page})
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="Failed to fetch POCs")
+        return response.json().get("pocs", [])
+
+    async def pages(self, start: int = 1, sort: str = POC_SYNC_SORT) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Feed pages sorted by `sort` from `start` on, until an empty or short page, or one seen before."""
+        seen = set()
+        page = start
+        while True:
+            rows = [poc_values(poc) for poc in await self.fetch_page(page, sort)]
+            keys = {(row["cve_id"], row["html_url"]) for row in rows}
+            # The same page again means the feed ignores `page`: there is nothing more to get
+            if not keys - seen:
+                if rows and page > 1:
+                    logger.warning(f"PoC feed returned page {page} again; stopping at page {page - 1}")
+                return
+            seen |= keys
+            yield page, rows
+            if len(rows) < self.page_size:
+                return
+            page += 1
 
     @staticmethod
-    def ensure_table_exists():
-        """
-        Check if the `pocs` table exists and create it if it doesn't.
-        """
-        conn = sqlite3.connect(PocService.DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS pocs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cve_id TEXT,
-                name TEXT,
-                owner TEXT,
-                full_name TEXT,
-                html_url TEXT,
-                description TEXT,
-                stargazers_count INTEGER,
-                nvd_description TEXT,
-                created_at TEXT,
-                updated_at TEXT,
-                pushed_at TEXT
-            )
-        """)
-        conn.commit()
-        conn.close()
+    async def upsert(session: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """Bulk insert-or-update on (cve_id, html_url), as one executemany."""
+        statement = insert(PocModel)
+        statement = statement.on_conflict_do_update(
+            index_elements=[PocModel.cve_id, PocModel.html_url],
+            set_={column: statement.excluded[column] for column in POC_COLUMNS[2:]},
+        )
+        await session.execute(statement, rows)
+
+    async def backfill(self, session: AsyncSession, state: SyncStateModel) -> int:
+        """Copy every page of the feed; progress is stored per page, so a restart resumes where it stopped."""
+        upserted = 0
+        async for page, rows in self.pages(state.backfill_page or 1):
+            await self.upsert(session, rows)
+            state.backfill_watermark = newest(state.backfill_watermark, rows)
+            state.updated_watermark = newest(state.updated_watermark, rows, POC_UPDATE_SORT)
+            state.backfill_page = page + 1
+            session.add(state)
+            await session.commit()
+            upserted += len(rows)
+        # PoCs pushed while the backfill ran are newer than its watermark, so the next run picks them up
+        state.watermark = state.backfill_watermark
+        state.backfilled = True
+        state.backfill_page = None
+        return upserted
+
+    async def pull_new(self, session: AsyncSession, state: SyncStateModel, sort: str = POC_SYNC_SORT,
+                       attribute: str = "watermark") -> int:
+        """Upsert the pages, newest first by `sort`, that are newer than the watermark held in `state.<attribute>`."""
+        watermark = getattr(state, attribute)
+        upserted = 0
+        async for _, rows in self.pages(sort=sort):
+            # Ties with the watermark are taken again: more PoCs may share its timestamp
+            fresh = [row for row in rows if watermark is None or (row[sort] is not None and row[sort] >= watermark)]
+            if fresh:
+                await self.upsert(session, fresh)
+                setattr(state, attribute, newest(getattr(state, attribute), fresh, sort))
+                session.add(state)
+                await session.commit()
+                upserted += len(fresh)
+            if watermark is not None and not any(row[sort] is not None and row[sort] > watermark for row in rows):
+                break
+        return upserted
+
+    async def pull_updated(self, session: AsyncSession, state: SyncStateModel) -> int:
+        """Upsert the PoCs updated since the last sync, however long ago they were pushed."""
+        if state.updated_watermark is None:
+            # Backfilled before updates were tracked: the stored rows are as fresh as their newest update
+            state.updated_watermark = await session.scalar(select(func.max(PocModel.updated_at)))
+        return await self.pull_new(session, state, POC_UPDATE_SORT, "updated_watermark")
+
+    async def sync(self) -> Dict[str, Any]:
+        """Backfill the feed until it is complete, then pull what is new; safe to run at any time."""
+        async with self.database.sessions() as session:
+            state = await session.get(SyncStateModel, self.name) or SyncStateModel(name=self.name, backfilled=False)
+            if state.backfilled:
+                upserted = await self.pull_new(session, state)
+                upserted += await self.pull_updated(session, state)
+            else:
+                upserted = await self.backfill(session, state)
+            state.synced_at = datetime.utcnow()
+            session.add(state)
+            await session.commit()
+        logger.info(f"PoC sync of {self.name} upserted {upserted} PoCs, watermark {state.watermark}")
+        return {"upserted": upserted, "watermark": state.watermark, "updated_watermark": state.updated_watermark,
+                "backfilled": state.backfilled}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = e.detail if isinstance(e, HTTPException) else str(e)
+                logger.error(f"PoC sync of {self.name} failed: {error}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def encode_cursor(value: Any, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, row_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if value is not None and sort in POC_DATE_FIELDS:
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_condition(column, order: str, value: Any, row_id: int):
+    """
+    Rows after `(value, row_id)` in `ORDER BY column <order>, id <order>`.
+    SQLite sorts NULLs first, so they lead ascending pages and trail descending ones.
+    """
+    key = tuple_(column, PocModel.id)
+    if order == "desc":
+        if value is None:
+            return and_(column.is_(None), PocModel.id < row_id)
+        return or_(key < tuple_(value, row_id), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), PocModel.id > row_id), column.isnot(None))
+    return key > tuple_(value, row_id)
+
+
+class PocService:
+    sync = PocSync(alerts_orm)
 
     @staticmethod
-    def get_pocs(limit: int = 50, cve_id: Optional[str] = None):
+    async def get_pocs(session: AsyncSession, limit: int = 50, cve_id: Optional[str] = None,
+                       since: Optional[datetime] = None, until: Optional[datetime] = None,
+                       date_field: str = "pushed_at", min_stars: Optional[int] = None, sort: str = "pushed_at",
+                       order: str = "desc", cursor: Optional[str] = None) -> Tuple[List[PocDTO], Optional[str]]:
         """
-        Fetch POCs from the database or fetch from an external API if not present.
-        Ensures the `pocs` table exists before proceeding.
+        One keyset page of POCs from the local store, which `PocSync` keeps up to date in the background.
+        `since`/`until` bound `date_field` (inclusive); returns the page and the cursor of the next one.
         """
-        # Ensure the table exists
-        PocService.ensure_table_exists()
-
-        # Connect to the SQLite database
-        conn = sqlite3.connect(PocService.DB_FILE)
-        cursor = conn.cursor()
+        if sort not in POC_SORTS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(POC_SORTS)}")
+        if date_field not in POC_DATE_FIELDS:
+            raise HTTPException(status_code=400, detail=f"date_field must be one of {', '.join(POC_DATE_FIELDS)}")
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail="order must be asc or desc")
+        limit = max(1, min(limit, POC_MAX_LIMIT))
+        sort_column = getattr(PocModel, sort)
+        date_column = getattr(PocModel, date_field)
 
-        # Build the SQL query
-        query = "SELECT * FROM pocs"
-        params = []
+        query = select(PocModel)
         if cve_id:
-            query += " WHERE cve_id = ?"
-            params.append(cve_id)
-        query += " LIMIT ?"
-        params.append(limit)
-
-        # Ensure params are passed as a tuple
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
-
-        if not rows:
-            # If no rows are found, fetch from external API
-            external_params = {"limit": limit}
-            if cve_id:
-                external_params["cve_id"] = cve_id
-
-            response = requests.get(PocService.BASE_URL, params=external_params)
-            if response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="Failed to fetch POCs")
-
-            pocs_data = response.json().get("pocs", [])
-
-            # Insert new data into the database
-            for poc_data in pocs_data:
-                cursor.execute("""
-                    INSERT INTO pocs (
-                        cve_id, name, owner, full_name, html_url, description, 
-                        stargazers_count, nvd_description, created_at, updated_at, pushed_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    str(poc_data.get("cve_id", "")),
-                    str(poc_data.get("name", "")),
-                    str(poc_data.get("owner", "")),
-                    str(poc_data.get("full_name", "")),
-                    str(poc_data.get("html_url", "")),
-                    poc_data.get("description", None),
-                    int(poc_data.get("stargazers_count", 0)),
-                    poc_data.get("nvd_description", None),
-                    poc_data.get("created_at", None),
-                    poc_data.get("updated_at", None),
-                    poc_data.get("pushed_at", None),
-                ))
-            conn.commit()
-
-            # Re-run the query to fetch the newly added rows
-            cursor.execute(query, tuple(params))
-            rows = cursor.fetchall()
-
-        conn.close()
-
-        # Convert rows to DTOs
-        return [PocDTO.from_sqlite_row(row) for row in rows]
+            query = query.where(PocModel.cve_id == cve_id)
+        if since:
+            query = query.where(date_column >= since)
+        if until:
+            query = query.where(date_column <= until)
+        if min_stars is not None:
+            query = query.where(PocModel.stargazers_count >= min_stars)
+        if cursor:
+            query = query.where(keyset_condition(sort_column, order, *decode_cursor(cursor, sort)))
+        if order == "desc":
+            query = query.order_by(sort_column.desc(), PocModel.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), PocModel.id.asc())
+        # One extra row tells whether another page exists
+        pocs = (await session.execute(query.limit(limit + 1))).scalars().all()
 
+        next_cursor = None
+        if len(pocs) > limit:
+            next_cursor = encode_cursor(getattr(pocs[limit - 1], sort), pocs[limit - 1].id)
+        return [PocDTO.model_validate(poc) for poc in pocs[:limit]], next_cursor
+
+    @staticmethod
+    async def get_pocs_for_cves(session: AsyncSession, cve_ids: List[str], min_stars: Optional[int] = None,
+                                per_cve: Optional[int] = None) -> Dict[str, List[PocDTO]]:
+        """POCs of many CVEs at once, most starred first, resolved on the cve_id index instead of per CVE."""
+        cve_ids = list(dict.fromkeys(cve_ids))
+        results: Dict[str, List[PocDTO]] = {cve_id: [] for cve_id in cve_ids}
+        for start in range(0, len(cve_ids), SQLITE_MAX_PARAMS):
+            position = func.row_number().over(
+                partition_by=PocModel.cve_id,
+                order_by=(PocModel.stargazers_count.desc(), PocModel.id),
+            ).label("position")
+            ranked = select(PocModel, position).where(PocModel.cve_id.in_(cve_ids[start:start + SQLITE_MAX_PARAMS]))
+            if min_stars is not None:
+                ranked = ranked.where(PocModel.stargazers_count >= min_stars)
+            ranked = ranked.subquery()
+            poc = aliased(PocModel, ranked)
+            query = select(poc).order_by(ranked.c.position)
+            if per_cve is not None:
+                query = query.where(ranked.c.position <= per_cve)
+            for row in (await session.execute(query)).scalars():
+                results[row.cve_id].append(PocDTO.model_validate(row))
+        return results
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from cachetools import TTLCache
+
+
+class RequestCache:
+    """
+    Short-lived cache of upstream responses with single-flight loading.
+    Each namespace has its own TTL; concurrent misses for the same key share one upstream call.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 1024):
+        self.caches = {namespace: TTLCache(maxsize=max_entries, ttl=ttl) for namespace, ttl in ttls.items()}
+        self._inflight: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, namespace: str, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        cache = self.caches[namespace]
+        if key in cache:
+            self.hits += 1
+            return cache[key]
+        inflight = self._inflight.get((namespace, key))
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[(namespace, key)] = future
+        generation = self._generation
+        try:
+            value = await load()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            # A load that raced an invalidation may hold stale data: hand it out, but don't keep it
+            if generation == self._generation:
+                cache[key] = value
+            return value
+        finally:
+            self._inflight.pop((namespace, key), None)
+
+    def invalidate(self, namespace: str, key: Hashable = None) -> None:
+        """Drop one key, or the whole namespace when no key is given."""
+        self._generation += 1
+        if key is None:
+            self.caches[namespace].clear()
+        else:
+            self.caches[namespace].pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": {namespace: len(cache) for namespace, cache in self.caches.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from services.chunked_ner import extract_entities_batch, unique_entities
+from services.storage import Database
+from services.worker_pool import nlp_pool
+
+logger = logging.getLogger(__name__)
+
+SCAN_ANALYSIS_BATCH = int(os.getenv("SCAN_ANALYSIS_BATCH", "200"))
+
+
+def event_fingerprint(event: Dict[str, Any]) -> str:
+    """Identity of a SpiderFoot event; the export carries no id of its own."""
+    key = [event.get("event_type"), event.get("module"), event.get("source_data"), event.get("data")]
+    return hashlib.sha256(json.dumps(key, default=str).encode("utf-8")).hexdigest()
+
+
+def event_entities(texts: List[str]) -> List[List[List[str]]]:
+    # Runs in the NLP pool
+    return [[list(pair) for pair in unique_entities(entities)] for entities in extract_entities_batch(texts)]
+
+
+class ScanAnalyzer:
+    """
+    Incremental NER over the free-text `data` field of SpiderFoot scan events, persisted per scan.
+    Each run remembers the newest `last_seen` it processed; later runs skip older events and
+    only analyze the ones they have not stored yet.
+    """
+
+    def __init__(self, database: Database, batch_size: int = SCAN_ANALYSIS_BATCH):
+        self.database = database
+        self.batch_size = batch_size
+
+    async def checkpoint(self, scan_id: str) -> Optional[str]:
+        row = await self.database.fetchone("SELECT checkpoint FROM scan_analyses WHERE scan_id = ?", (scan_id,))
+        return row["checkpoint"] if row else None
+
+    async def _process(self, scan_id: str, events: List[Dict[str, Any]]) -> int:
+        fingerprints = {event_fingerprint(event): event for event in events}
+        placeholders = ", ".join("?" * len(fingerprints))
+        stored = await self.database.fetchall(
+            f"SELECT fingerprint FROM scan_events WHERE scan_id = ? AND fingerprint IN ({placeholders})",
+            (scan_id, *fingerprints))
+        for row in stored:
+            fingerprints.pop(row["fingerprint"])
+        if not fingerprints:
+            return 0
+
+        new_events = list(fingerprints.items())
+        texts = [str(event.get("data") or "") for _, event in new_events]
+        entities = await nlp_pool.run(event_entities, texts)
+        await self.database.executemany('''INSERT OR IGNORE INTO scan_events
+                                           (scan_id, fingerprint, event_type, module, data, last_seen, entities)
+                                           VALUES (?, ?, ?, ?, ?, ?, ?)''', [
+            (scan_id, fingerprint, event.get("event_type"), event.get("module"), text,
+             str(event["last_seen"]) if event.get("last_seen") is not None else None, json.dumps(pairs))
+            for (fingerprint, event), text, pairs in zip(new_events, texts, entities)
+        ])
+        return len(new_events)
+
+    async def analyze(self, scan_id: str, events: AsyncIterator[Dict[str, Any]]) -> Dict[str, Any]:
+        """Consume a stream of scan events in batches, analyzing and storing those newer than the checkpoint."""
+        checkpoint = await self.checkpoint(scan_id)
+        latest = checkpoint
+        scanned = new_events = 0
+        batch: List[Dict[str, Any]] = []
+        async for event in events:
+            scanned += 1
+            last_seen = str(event["last_seen"]) if event.get("last_seen") is not None else None
+            # Events of the checkpoint's own second may have arrived after it; the fingerprint check catches repeats
+            if checkpoint is not None and last_seen is not None and last_seen < checkpoint:
+                continue
+            if last_seen is not None and (latest is None or last_seen > latest):
+                latest = last_seen
+            batch.append(event)
+            if len(batch) >= self.batch_size:
+                new_events += await self._process(scan_id, batch)
+                batch = []
+        if batch:
+            new_events += await self._process(scan_id, batch)
+
+        async with self.database.transaction() as conn:
+            await conn.execute('''INSERT INTO scan_analyses (scan_id, checkpoint, events, updated_at)
+                                  VALUES (?, ?, (SELECT COUNT(*) FROM scan_events WHERE scan_id = ?), CURRENT_TIMESTAMP)
+                                  ON CONFLICT (scan_id) DO UPDATE SET
+                                      checkpoint = excluded.checkpoint,
+                                      events = excluded.events,
+                                      updated_at = excluded.updated_at''', (scan_id, latest, scan_id))
+        logger.info(f"Analyzed {new_events} new of {scanned} events for scan {scan_id}")
+        return {**await self.results(scan_id), "scanned_events": scanned, "new_events": new_events}
+
+    async def results(self, scan_id: str) -> Dict[str, Any]:
+        """Stored analysis of a scan: entities with the number of events mentioning them."""
+        analysis = await self.database.fetchone(
+            "SELECT checkpoint, events, updated_at FROM scan_analyses WHERE scan_id = ?", (scan_id,))
+        rows = await self.database.fetchall('''
+            SELECT json_extract(entity.value, '$[0]') AS label, json_extract(entity.value, '$[1]') AS text,
+                   COUNT(*) AS events
+            FROM scan_events, json_each(scan_events.entities) AS entity
+            WHERE scan_events.scan_id = ?
+            GROUP BY label, text
+            ORDER BY events DESC, label, text''', (scan_id,))
+        return {
+            "scanId": scan_id,
+            "checkpoint": analysis["checkpoint"] if analysis else None,
+            "events": analysis["events"] if analysis else 0,
+            "updated_at": analysis["updated_at"] if analysis else None,
+            "doc": [dict(row) for row in rows],
+        }
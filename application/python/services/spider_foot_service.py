@@ -1,31 +1,52 @@
-from typing import Any, Dict, List
-import requests
+import os
+from typing import Any, AsyncIterator, Dict, List
+
+import ijson
 from fastapi import HTTPException
 
-from dto.scans.scan_dtos import ScanEventsDTO
-from dto.scans.scan_dtos import EventDTO
+from services.http_client import ServiceClient
+from services.request_cache import RequestCache
 
-HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+SPIDERFOOT_URL = os.getenv("SPIDERFOOT_URL", "http://localhost:10002")
+# Event exports of large scans take a while to produce
+SPIDERFOOT_READ_TIMEOUT = float(os.getenv("SPIDERFOOT_READ_TIMEOUT", "120"))
+# Dashboards poll these every few seconds; a short TTL absorbs the polling without going stale
+SCAN_LIST_TTL = float(os.getenv("SCAN_LIST_TTL", "5"))
+SCAN_OPTIONS_TTL = float(os.getenv("SCAN_OPTIONS_TTL", "30"))
+SCAN_GRAPHICS_TTL = float(os.getenv("SCAN_GRAPHICS_TTL", "10"))
+SCAN_CACHE_TTLS = {"list": SCAN_LIST_TTL, "options": SCAN_OPTIONS_TTL, "graphics": SCAN_GRAPHICS_TTL}
 
 
 class SpiderFootAPI:
     """Configuration for SpiderFoot API endpoints."""
-    BASE_URL = "http://localhost:10002"
-    START_SCAN = f"{BASE_URL}/startscan"
-    SCAN_LIST = f"{BASE_URL}/scanlist"
-    SCAN_OPTIONS = f"{BASE_URL}/scanopts?id="
-    SCAN_GRAPHICS = f"{BASE_URL}/scanviz?id="
-    STOP_SCAN = f"{BASE_URL}/stopscan?id="
-    DELETE_SCAN = f"{BASE_URL}/scandelete?id="
-    SCAN_EVENTS = f"{BASE_URL}/scanexportjsonmulti?ids="
+    BASE_URL = SPIDERFOOT_URL
+    START_SCAN = "/startscan"
+    SCAN_LIST = "/scanlist"
+    SCAN_OPTIONS = "/scanopts"
+    SCAN_GRAPHICS = "/scanviz"
+    STOP_SCAN = "/stopscan"
+    DELETE_SCAN = "/scandelete"
+    SCAN_EVENTS = "/scanexportjsonmulti"
+
 
+spiderfoot_client = ServiceClient("SpiderFoot", SpiderFootAPI.BASE_URL, read_timeout=SPIDERFOOT_READ_TIMEOUT)
 
 
 class SpiderFootService:
     """Service to handle SpiderFoot API interactions."""
 
-    @staticmethod
-    def start_scan(target: str, identifier: str) -> Dict[str, Any]:
+    client = spiderfoot_client
+    cache = RequestCache(SCAN_CACHE_TTLS)
+
+    @classmethod
+    def invalidate(cls, scan_id: str) -> None:
+        """Forget everything cached about a scan, e.g. after it was stopped or deleted."""
+        cls.cache.invalidate("list")
+        cls.cache.invalidate("options", scan_id)
+        cls.cache.invalidate("graphics", scan_id)
+
+    @classmethod
+    async def start_scan(cls, target: str, identifier: str) -> List[Any]:
         post_data = {
             "scanname": identifier,
             "scantarget": target,
@@ -33,53 +54,77 @@ class SpiderFootService:
             "modulelist": "",
             "typelist": "",
         }
-        response = requests.get(SpiderFootAPI.START_SCAN, params=post_data, headers=HEADERS)
+        # Not idempotent: a retried request could start the scan twice
+        response = await cls.client.get(SpiderFootAPI.START_SCAN, params=post_data, idempotent=False)
+        cls.cache.invalidate("list")
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail="Failed to start scan")
         return response.json()
 
-    @staticmethod 
-    def stop_scan(scan_id: str) -> Dict[str, Any]:
-        response = requests.get(SpiderFootAPI.STOP_SCAN + scan_id,  headers=HEADERS)
-        print(response.status_code)
+    @classmethod
+    async def stop_scan(cls, scan_id: str) -> Any:
+        response = await cls.client.get(SpiderFootAPI.STOP_SCAN, params={"id": scan_id})
+        cls.invalidate(scan_id)
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail="Failed to stop scan")
         return response.json()
 
-    @staticmethod 
-    def delete_scan(scan_id: str) -> Dict[str, Any]:
-        response = requests.get(SpiderFootAPI.DELETE_SCAN + scan_id,  headers=HEADERS)
-        print(response.status_code)
+    @classmethod
+    async def delete_scan(cls, scan_id: str) -> Dict[str, Any]:
+        response = await cls.client.get(SpiderFootAPI.DELETE_SCAN, params={"id": scan_id})
+        cls.invalidate(scan_id)
         if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to delete scan with status code " + str(response.status_code))
-        return {success: "SUCCESS", scan_id: scan_id, content: response.content}
+            raise HTTPException(status_code=response.status_code,
+                                detail=f"Failed to delete scan with status code {response.status_code}")
+        return {"success": "SUCCESS", "scan_id": scan_id, "content": response.text}
 
-    @staticmethod
-    def get_scan_list() -> List[Dict[str, Any]]:
-        response = requests.get(SpiderFootAPI.SCAN_LIST, headers=HEADERS)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan list")
-        return response.json()
+    @classmethod
+    async def get_scan_list(cls) -> List[List[Any]]:
+        async def load():
+            response = await cls.client.get(SpiderFootAPI.SCAN_LIST)
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan list")
+            return response.json()
+        return await cls.cache.get("list", None, load)
 
-    @staticmethod
-    def get_scan_options(scan_id: str) -> Dict[str, Any]:
-        response = requests.get(SpiderFootAPI.SCAN_OPTIONS + scan_id, headers=HEADERS)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan options")
-        return response.json()
+    @classmethod
+    async def get_scan_options(cls, scan_id: str) -> Dict[str, Any]:
+        async def load():
+            response = await cls.client.get(SpiderFootAPI.SCAN_OPTIONS, params={"id": scan_id})
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan options")
+            return response.json()
+        return await cls.cache.get("options", scan_id, load)
 
-    @staticmethod
-    def get_scan_graphics(scan_id: str) -> Dict[str, Any]:
-        response = requests.get(SpiderFootAPI.SCAN_GRAPHICS + scan_id, headers=HEADERS)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan graphics")
-        return response.json()
+    @classmethod
+    async def get_scan_graphics(cls, scan_id: str) -> Dict[str, Any]:
+        async def load():
+            response = await cls.client.get(SpiderFootAPI.SCAN_GRAPHICS, params={"id": scan_id})
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan graphics")
+            return response.json()
+        return await cls.cache.get("graphics", scan_id, load)
 
-    @staticmethod
-    def get_scan_events(scan_id: str) -> ScanEventsDTO:
-        response = requests.get(SpiderFootAPI.SCAN_EVENTS + scan_id, headers=HEADERS)
-        print(response.status_code)
+    @classmethod
+    async def get_scan_events(cls, scan_id: str) -> List[Dict[str, Any]]:
+        response = await cls.client.get(SpiderFootAPI.SCAN_EVENTS, params={"ids": scan_id})
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan events")
-        
-        return response  # Returns a list of dictionaries
\ No newline at end of file
+        return response.json()  # Returns a list of dictionaries
+
+    @classmethod
+    async def stream_scan_events(cls, scan_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the events of a scan one by one, parsing the export as it arrives instead of loading it whole."""
+        async with cls.client.stream(SpiderFootAPI.SCAN_EVENTS, params={"ids": scan_id}) as response:
+            if response.status_code != 200:
+                raise HTTPException(status_code=response.status_code, detail="Failed to fetch scan events")
+            events = ijson.sendable_list()
+            parser = ijson.items_coro(events, "item", use_float=True)
+            async for chunk in response.aiter_bytes():
+                parser.send(chunk)
+                for event in events:
+                    yield event
+                del events[:]
+            parser.close()
+            for event in events:
+                yield event
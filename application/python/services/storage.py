@@ -0,0 +1,300 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Sequence
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+STORAGE_POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "4"))
+STORAGE_BUSY_TIMEOUT_MS = int(os.getenv("STORAGE_BUSY_TIMEOUT_MS", "5000"))
+# Stay well below SQLite's bound-parameter limit in IN (...) lists
+SQLITE_MAX_PARAMS = 900
+
+
+class Database:
+    """
+    Pool of aiosqlite connections to one SQLite file, in WAL mode.
+    Readers never block the writer and vice versa; concurrent writers wait on `busy_timeout`
+    instead of failing. The schema callback runs once, on the first connection.
+    """
+
+    def __init__(self, path: str, setup: Optional[Callable[[aiosqlite.Connection], Awaitable[None]]] = None,
+                 pool_size: int = STORAGE_POOL_SIZE):
+        self.path = path
+        self.setup = setup
+        self.pool_size = pool_size
+        self._pool: Optional[asyncio.Queue] = None
+        self._connections: List[aiosqlite.Connection] = []
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def _open(self) -> aiosqlite.Connection:
+        # Autocommit mode: transactions are only ever opened explicitly by `transaction()`
+        conn = await aiosqlite.connect(self.path, isolation_level=None)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute("PRAGMA synchronous=NORMAL")
+        await conn.execute(f"PRAGMA busy_timeout={STORAGE_BUSY_TIMEOUT_MS}")
+        # INSERT OR REPLACE only fires delete triggers (which keep FTS indexes in sync) with this on
+        await conn.execute("PRAGMA recursive_triggers=ON")
+        return conn
+
+    async def connect(self) -> None:
+        """Open the pool and set up the schema; safe to call more than once."""
+        if self._pool is not None:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._pool is not None:
+                return
+            pool = asyncio.Queue()
+            first = await self._open()
+            if self.setup is not None:
+                await self.setup(first)
+                await first.commit()
+            self._connections = [first] + [await self._open() for _ in range(self.pool_size - 1)]
+            for conn in self._connections:
+                pool.put_nowait(conn)
+            self._pool = pool
+            logger.info(f"Opened {self.pool_size} connections to {self.path}")
+
+    async def close(self) -> None:
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+        self._pool = None
+
+    @asynccontextmanager
+    async def connection(self):
+        """Borrow a pooled connection for the duration of the block."""
+        await self.connect()
+        conn = await self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put_nowait(conn)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Borrow a connection inside `BEGIN IMMEDIATE`; commits on success, rolls back on error."""
+        async with self.connection() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+    async def fetchall(self, sql: str, params: Sequence[Any] = ()) -> List[sqlite3.Row]:
+        async with self.connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return list(await cursor.fetchall())
+
+    async def fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        async with self.connection() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return await cursor.fetchone()
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """Run one write statement in its own transaction and return the last row id."""
+        async with self.transaction() as conn:
+            async with conn.execute(sql, params) as cursor:
+                return cursor.lastrowid
+
+    async def executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> None:
+        async with self.transaction() as conn:
+            await conn.executemany(sql, rows)
+
+
+async def column_names(conn: aiosqlite.Connection, table: str) -> set:
+    async with conn.execute(f"PRAGMA table_info({table})") as cursor:
+        return {row[1] for row in await cursor.fetchall()}
+
+
+async def setup_nlp_schema(conn: aiosqlite.Connection) -> None:
+    await conn.execute('''CREATE TABLE IF NOT EXISTS articles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        link TEXT UNIQUE,
+        title TEXT,
+        date TEXT,
+        text TEXT,
+        data JSON,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+    # PDFs are identified by content hash alone; several uploads may share a filename
+    await conn.execute(PDFS_TABLE.format(table="pdfs"))
+
+    await conn.execute('''CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        text TEXT,
+        keywords JSON,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+    # Migrations for databases created before the column existed
+    if "content_hash" not in await column_names(conn, "articles"):
+        await conn.execute("ALTER TABLE articles ADD COLUMN content_hash TEXT")
+    if "summary" not in await column_names(conn, "articles"):
+        await conn.execute("ALTER TABLE articles ADD COLUMN summary TEXT")
+    if "computed_fields" not in await column_names(conn, "pdfs"):
+        await conn.execute("ALTER TABLE pdfs ADD COLUMN computed_fields JSON")
+    if "content_hash" not in await column_names(conn, "pdfs"):
+        await conn.execute("ALTER TABLE pdfs ADD COLUMN content_hash TEXT")
+    if "filename" in await unique_constraint_columns(conn, "pdfs"):
+        await rebuild_pdfs_table(conn)
+    await conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_pdfs_content_hash ON pdfs (content_hash)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_content_hash ON articles (content_hash)")
+    if "text_hash" not in await column_names(conn, "tags"):
+        await conn.execute("ALTER TABLE tags ADD COLUMN text_hash TEXT")
+    if not await index_exists(conn, "idx_tags_text_hash"):
+        # Identical texts used to get a row each; keep the oldest one
+        await conn.create_function("sha256", 1, lambda text: hashlib.sha256((text or "").encode("utf-8")).hexdigest(),
+                                   deterministic=True)
+        await conn.execute("UPDATE tags SET text_hash = sha256(text) WHERE text_hash IS NULL")
+        await conn.execute("DELETE FROM tags WHERE id NOT IN (SELECT MIN(id) FROM tags GROUP BY text_hash)")
+        await conn.execute("CREATE UNIQUE INDEX idx_tags_text_hash ON tags (text_hash)")
+
+    # Keyset pagination indexes, newest first
+    for table in ("articles", "pdfs", "tags"):
+        await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created ON {table} (created_at DESC, id DESC)")
+
+    # Full-text search over stored documents
+    await setup_fts_index(conn, "articles", ("title", "text"))
+    await setup_fts_index(conn, "pdfs", ("markdown",))
+
+    await setup_entity_schema(conn)
+    await setup_scan_schema(conn)
+
+
+PDFS_TABLE = '''CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT,
+    markdown TEXT,
+    entities JSON,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    computed_fields JSON,
+    content_hash TEXT
+)'''
+
+
+async def unique_constraint_columns(conn: aiosqlite.Connection, table: str) -> set:
+    """Columns covered by the UNIQUE constraints declared in the table definition."""
+    columns = set()
+    async with conn.execute(f"PRAGMA index_list({table})") as cursor:
+        indexes = [row[1] for row in await cursor.fetchall() if row[3] == "u"]
+    for index in indexes:
+        async with conn.execute(f"PRAGMA index_info({index})") as cursor:
+            columns |= {row[2] for row in await cursor.fetchall()}
+    return columns
+
+
+async def rebuild_pdfs_table(conn: aiosqlite.Connection) -> None:
+    """
+    Copy `pdfs` into a table without the old UNIQUE(filename), which SQLite cannot drop in place.
+    Row ids are kept, so entity mentions and the FTS index still point at the right rows;
+    the dropped triggers and indexes are recreated by the rest of the schema setup.
+    """
+    columns = "id, filename, markdown, entities, created_at, computed_fields, content_hash"
+    await conn.execute("BEGIN IMMEDIATE")
+    try:
+        await conn.execute(PDFS_TABLE.format(table="pdfs_rebuilt"))
+        await conn.execute(f"INSERT INTO pdfs_rebuilt ({columns}) SELECT {columns} FROM pdfs")
+        await conn.execute("DROP TABLE pdfs")
+        await conn.execute("ALTER TABLE pdfs_rebuilt RENAME TO pdfs")
+    except BaseException:
+        await conn.rollback()
+        raise
+    await conn.commit()
+    logger.info("Rebuilt the pdfs table without UNIQUE(filename)")
+
+
+async def index_exists(conn: aiosqlite.Connection, name: str) -> bool:
+    async with conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)) as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def table_exists(conn: aiosqlite.Connection, name: str) -> bool:
+    async with conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)) as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def setup_fts_index(conn: aiosqlite.Connection, table: str, columns: Sequence[str]) -> None:
+    """
+    External-content FTS5 index `<table>_fts` over `columns`, kept in sync by triggers.
+    A freshly created index is rebuilt from the rows already in `table`.
+    """
+    fts = f"{table}_fts"
+    created = not await table_exists(conn, fts)
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+
+    await conn.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+        {column_list}, content='{table}', content_rowid='id', tokenize='porter unicode61'
+    )""")
+    await conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {fts} (rowid, {column_list}) VALUES (new.id, {new_values});
+    END""")
+    await conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+    END""")
+    await conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {column_list} ON {table} BEGIN
+        INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        INSERT INTO {fts} (rowid, {column_list}) VALUES (new.id, {new_values});
+    END""")
+    if created:
+        await conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+async def setup_entity_schema(conn: aiosqlite.Connection) -> None:
+    """Normalized entity mentions, one row per (document, label, normalized text)."""
+    await conn.execute('''CREATE TABLE IF NOT EXISTS entities (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        doc_type TEXT NOT NULL,
+        doc_id INTEGER NOT NULL,
+        label TEXT NOT NULL,
+        text TEXT NOT NULL,
+        norm_text TEXT NOT NULL,
+        UNIQUE (doc_type, doc_id, label, norm_text)
+    )''')
+    # Entity -> documents lookups and per-label rankings
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_entities_label_text ON entities (label, norm_text)")
+    await conn.execute("CREATE INDEX IF NOT EXISTS idx_entities_text ON entities (norm_text)")
+
+    # Rows go away with their document, including the delete half of INSERT OR REPLACE
+    for doc_type, table in (("article", "articles"), ("pdf", "pdfs")):
+        await conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {table}_entities_delete AFTER DELETE ON {table} BEGIN
+            DELETE FROM entities WHERE doc_type = '{doc_type}' AND doc_id = old.id;
+        END""")
+
+
+async def setup_scan_schema(conn: aiosqlite.Connection) -> None:
+    """Analyzed SpiderFoot events, one row per distinct event, and each scan's analysis checkpoint."""
+    await conn.execute('''CREATE TABLE IF NOT EXISTS scan_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        scan_id TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        event_type TEXT,
+        module TEXT,
+        data TEXT,
+        last_seen TEXT,
+        entities JSON,
+        UNIQUE (scan_id, fingerprint)
+    )''')
+    await conn.execute('''CREATE TABLE IF NOT EXISTS scan_analyses (
+        scan_id TEXT PRIMARY KEY,
+        checkpoint TEXT,
+        events INTEGER DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+
+# One pool per database file
+nlp_db = Database("nlp_data.db", setup=setup_nlp_schema)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import math
+import os
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from classes.TextSummarizer import TextProcessor, split_sentences
+from services.storage import Database
+from services.worker_pool import nlp_pool, process_pool
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_BATCH_LIMIT = int(os.getenv("SUMMARY_BATCH_LIMIT", "5000"))
+
+# Sentences of a document and the words of each sentence
+Terms = Tuple[List[str], List[List[str]]]
+
+
+def document_terms(texts: Sequence[str]) -> List[Terms]:
+    # Runs in a worker process: splitting and lemmatizing is the costly, pure-Python part
+    documents = []
+    for text in texts:
+        sentences = split_sentences(text)
+        documents.append((sentences, TextProcessor(sentences).sentences_terms()))
+    return documents
+
+
+def summarize_documents(documents: Sequence[Terms], idf: Optional[Dict[str, float]] = None) -> List[str]:
+    """Score already tokenized documents; sparse-matrix work only, so it runs on a thread."""
+    summaries = []
+    for sentences, terms in documents:
+        processor = TextProcessor(sentences, terms)
+        summaries.append(processor.summarize_article() if idf is None else processor.summarize_with_idf(idf))
+    return summaries
+
+
+def corpus_idf(documents: Sequence[Terms]) -> Dict[str, float]:
+    """IDF of every word with documents, not sentences, as the unit: log10(N / documents containing it)."""
+    document_frequency = Counter(word for _, terms in documents for word in {word for sent in terms for word in sent})
+    total = len(documents)
+    return {word: math.log10(total / count) for word, count in document_frequency.items()}
+
+
+class SummaryService:
+    """Corpus-level TF-IDF summaries, tokenized on the shared process pool."""
+
+    @staticmethod
+    async def tokenize(texts: Sequence[str]) -> List[Terms]:
+        """Split and lemmatize `texts` in one chunk per pool process, so large batches stay within its queue."""
+        size = max(1, -(-len(texts) // process_pool.size))
+        chunks = await asyncio.gather(*[process_pool.run(document_terms, list(texts[start:start + size]))
+                                        for start in range(0, len(texts), size)])
+        return [document for chunk in chunks for document in chunk]
+
+    @classmethod
+    async def summarize_corpus(cls, texts: Sequence[str]) -> List[str]:
+        """
+        Summarize many documents. Words are weighted by how many documents of the batch use them,
+        so terms common to the whole corpus stop dominating every summary.
+        Every document is tokenized once; a batch of one falls back to sentence-level IDF.
+        """
+        if not texts:
+            return []
+        documents = await cls.tokenize(texts)
+        idf = corpus_idf(documents) if len(documents) > 1 else None
+        return await nlp_pool.run(summarize_documents, documents, idf)
+
+    @classmethod
+    async def summarize_articles(cls, database: Database, since: Optional[str] = None, until: Optional[str] = None,
+                                 limit: int = SUMMARY_BATCH_LIMIT, only_missing: bool = True) -> Dict[str, int]:
+        """
+        Summarize stored articles created in `[since, until]` (by default the last 24 hours)
+        as one corpus, and write the summaries back in a single transaction.
+        """
+        where, params = ["created_at >= COALESCE(?, datetime('now', '-1 day'))"], [since]
+        if until:
+            where.append("created_at <= ?")
+            params.append(until)
+        if only_missing:
+            where.append("summary IS NULL")
+        rows = await database.fetchall(
+            f"SELECT id, text FROM articles WHERE {' AND '.join(where)} AND text IS NOT NULL "
+            f"ORDER BY created_at, id LIMIT ?", (*params, max(1, min(limit, SUMMARY_BATCH_LIMIT))))
+        if not rows:
+            return {"documents": 0}
+
+        summaries = await cls.summarize_corpus([row["text"] for row in rows])
+        await database.executemany("UPDATE articles SET summary = ? WHERE id = ?",
+                                   [(summary, row["id"]) for summary, row in zip(summaries, rows)])
+        logger.info(f"Summarized {len(rows)} articles as one corpus")
+        return {"documents": len(rows)}
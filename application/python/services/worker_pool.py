@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import logging
+import os
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("NLP_POOL_SIZE", "2"))
+QUEUE_DEPTH = int(os.getenv("NLP_POOL_QUEUE_DEPTH", "16"))
+TASK_TIMEOUT = float(os.getenv("NLP_TASK_TIMEOUT", "300"))
+IO_POOL_SIZE = int(os.getenv("IO_POOL_SIZE", "16"))
+IO_QUEUE_DEPTH = int(os.getenv("IO_POOL_QUEUE_DEPTH", "256"))
+IO_TASK_TIMEOUT = float(os.getenv("IO_TASK_TIMEOUT", "60"))
+PROCESS_POOL_SIZE = int(os.getenv("PROCESS_POOL_SIZE", str(os.cpu_count() or 2)))
+PROCESS_QUEUE_DEPTH = int(os.getenv("PROCESS_POOL_QUEUE_DEPTH", "64"))
+PROCESS_TASK_TIMEOUT = float(os.getenv("PROCESS_TASK_TIMEOUT", "300"))
+
+
+class WorkerPool:
+    """
+    Bounded thread pool for CPU-bound work (spaCy, YAKE, PDF conversion).
+    Threads share the pipelines held by the model registry, so no model is copied per worker.
+    At most `size` tasks run at once and at most `queue_depth` more wait; anything beyond is rejected.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, queue_depth: int = QUEUE_DEPTH, timeout: float = TASK_TIMEOUT,
+                 name: str = "nlp-worker"):
+        self.size = size
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.name = name
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run `func` in the pool and await its result without blocking the event loop."""
+        with self._lock:
+            if self._pending >= self.size + self.queue_depth:
+                self._rejected += 1
+                raise HTTPException(status_code=503, detail="Processing queue is full, retry later")
+            self._pending += 1
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        future.add_done_callback(self._task_done)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timed_out += 1
+            # A running task cannot be interrupted; it keeps its slot until it finishes.
+            logger.warning(f"Task {getattr(func, '__name__', func)} exceeded {timeout or self.timeout}s")
+            raise HTTPException(status_code=504, detail="Processing timed out")
+
+    def _task_done(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "queue_depth": self.queue_depth,
+            "timeout": self.timeout,
+            "pending": self._pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "timed_out": self._timed_out,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class ProcessPool(WorkerPool):
+    """
+    `WorkerPool` backed by worker processes, for pure-Python CPU work the GIL would serialize
+    (PDF conversion, summarization). Tasks must be picklable, module-level functions.
+    """
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Spawned, not forked: workers must not inherit the loaded spaCy models or pool threads
+                    self._executor = ProcessPoolExecutor(max_workers=self.size,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+
+# Shared pools used by every endpoint: CPU-bound model work, and blocking network/disk calls
+nlp_pool = WorkerPool()
+io_pool = WorkerPool(size=IO_POOL_SIZE, queue_depth=IO_QUEUE_DEPTH, timeout=IO_TASK_TIMEOUT, name="io-worker")
+process_pool = ProcessPool(size=PROCESS_POOL_SIZE, queue_depth=PROCESS_QUEUE_DEPTH, timeout=PROCESS_TASK_TIMEOUT,
+                           name="process-worker")
@@ -0,0 +1,37 @@
+import asyncio
+from types import SimpleNamespace
+
+from api.endpoints import nlp
+from services.storage import nlp_db
+
+TEXT = "The same story, syndicated word for word under two different URLs."
+FIELDS = ["social", "social_shares"]
+
+
+def fetched(link):
+    return SimpleNamespace(title="Story", publish_date=None, text=TEXT, article_html="<p>Story</p>", summary="",
+                           authors=[], top_image=None, images=set(), movies=[])
+
+
+def test_content_hit_from_another_url_recomputes_link_fields(tmp_path, monkeypatch):
+    monkeypatch.setattr(nlp_db, "path", str(tmp_path / "nlp.db"))
+    monkeypatch.setattr(nlp, "fetch_article", fetched)
+    monkeypatch.setattr(nlp.ArticleFields, "social", lambda self: {"links": [self.link]})
+    monkeypatch.setattr(nlp.ArticleFields, "social_shares", lambda self: {"url": self.link})
+
+    async def scenario():
+        await nlp_db.connect()
+        try:
+            first = await nlp.run_article(nlp.ArticleAction(link="https://a.example/story", fields=FIELDS))
+            second = await nlp.run_article(nlp.ArticleAction(link="https://b.example/story", fields=FIELDS))
+            stored = await nlp.article_cache.get("https://b.example/story")
+        finally:
+            await nlp_db.close()
+        return first, second, stored
+
+    first, second, stored = asyncio.run(scenario())
+    assert first["data"]["social_shares"] == {"url": "https://a.example/story"}
+    assert second["data"]["social_shares"] == {"url": "https://b.example/story"}
+    assert second["data"]["social"] == {"links": ["https://b.example/story"]}
+    assert stored["social_shares"] == {"url": "https://b.example/story"}
+    assert nlp.article_cache.stats()["content_hits"] == 1